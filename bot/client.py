@@ -60,6 +60,7 @@ class ShadowBot(Client):
     Attributes:
         is_enabled (bool): Bot enabled flag
         is_connected (bool): Telegram connection status
+        ready (asyncio.Condition): Notified once is_connected becomes True
         session_pool (SessionPool): DC-specific session manager
     """
     
@@ -76,6 +77,8 @@ class ShadowBot(Client):
         """
         self.is_enabled = True
         self.is_connected = False
+        # Readiness gate: request handlers wait on this instead of racing start()
+        self.ready = asyncio.Condition()
 
         # 🗑️ AUTO-CLEANUP CORRUPT FILES
         # Remove empty session files to prevent auth errors
@@ -95,6 +98,9 @@ class ShadowBot(Client):
             plugins=dict(root="bot/plugins"),  # Auto-load all plugins
             # STABILITY SETTINGS
             workers=4,  # Concurrent update handlers
+            # Pyrogram defaults to 1. Our get_file takes a permit per GetFile request
+            # (released between chunks), so this caps upload.GetFile calls in flight
+            max_concurrent_transmissions=Config.MAX_CONCURRENT_TRANSMISSIONS,
             ipv6=False,  # IPv4 only for compatibility
             # PERSISTENCE
             in_memory=False,  # Save session to disk
@@ -121,7 +127,7 @@ class ShadowBot(Client):
         try:
             logger.info("Starting bot connection to Telegram...")
             await super().start()
-            self.is_connected = True
+            await self._mark_ready()
             logger.info("✅ Bot connected successfully")
 
         # 🛑 FLOOD WAIT HANDLER
@@ -132,7 +138,7 @@ class ShadowBot(Client):
             await asyncio.sleep(wait_time)
 
             await super().start()
-            self.is_connected = True
+            await self._mark_ready()
             logger.info("✅ Bot connected after FloodWait")
 
         except Exception as e:
@@ -143,9 +149,54 @@ class ShadowBot(Client):
                 logger.warning("Session database corrupt, cleaning up...")
                 self.cleanup_session()
                 await super().start()
-                self.is_connected = True
+                await self._mark_ready()
                 logger.info("✅ Bot connected after session cleanup")
 
+    async def _mark_ready(self):
+        """Flag the client as connected and wake every request waiting on it."""
+        self.is_connected = True
+        async with self.ready:
+            self.ready.notify_all()
+
+    async def wait_until_ready(self, timeout: float) -> bool:
+        """
+        Wait for the client to finish connecting.
+        
+        Concurrent callers all wait on the same Condition, so a burst of
+        cold requests never triggers duplicate start() attempts.
+        
+        Args:
+            timeout (float): Max seconds to wait
+            
+        Returns:
+            bool: True if connected, False on timeout
+        """
+        if self.is_connected:
+            return True
+        try:
+            async with self.ready:
+                await asyncio.wait_for(self.ready.wait_for(lambda: self.is_connected), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _invoke_transmission(self, dc_id: int, query, session: Optional[Session] = None, **kwargs):
+        """
+        Run one file-transfer RPC while holding a get_file_semaphore permit.
+        
+        Without an explicit session, a pooled one for dc_id is borrowed for
+        just this call (taken after the permit), so sessions in use never
+        exceed MAX_CONCURRENT_TRANSMISSIONS and a parked generator holds none.
+        """
+        async with self.get_file_semaphore:
+            if session is not None:
+                return await session.invoke(query, **kwargs)
+            session = await self.session_pool.get_session(dc_id)
+            try:
+                return await session.invoke(query, **kwargs)
+            finally:
+                await self.session_pool.release_session(session)
+
     async def get_file(
         self,
         file_id: FileId,
@@ -182,72 +233,178 @@ class ShadowBot(Client):
             >>> async for chunk in bot.get_file(file_id, offset=10, limit=5):
             ...     # Skips first 10MB, downloads next 5MB
             ...     process_chunk(chunk)
+        
+        get_file_semaphore (MAX_CONCURRENT_TRANSMISSIONS) and the pooled
+        session are taken per GetFile request, not for the generator's
+        lifetime - a consumer parked between chunks (paused player, full
+        prefetch queue) holds neither.
         """
-        async with self.get_file_semaphore:
-            file_type = file_id.file_type
+        file_type = file_id.file_type
 
-            if file_type == FileType.CHAT_PHOTO:
-                if file_id.chat_id > 0:
-                    peer = raw.types.InputPeerUser(
-                        user_id=file_id.chat_id,
-                        access_hash=file_id.chat_access_hash,
+        if file_type == FileType.CHAT_PHOTO:
+            if file_id.chat_id > 0:
+                peer = raw.types.InputPeerUser(
+                    user_id=file_id.chat_id,
+                    access_hash=file_id.chat_access_hash,
+                )
+            else:
+                if file_id.chat_access_hash == 0:
+                    peer = raw.types.InputPeerChat(
+                        chat_id=-file_id.chat_id,
                     )
                 else:
-                    if file_id.chat_access_hash == 0:
-                        peer = raw.types.InputPeerChat(
-                            chat_id=-file_id.chat_id,
-                        )
-                    else:
-                        peer = raw.types.InputPeerChannel(
-                            channel_id=utils.get_channel_id(file_id.chat_id),
-                            access_hash=file_id.chat_access_hash,
+                    peer = raw.types.InputPeerChannel(
+                        channel_id=utils.get_channel_id(file_id.chat_id),
+                        access_hash=file_id.chat_access_hash,
+                    )
+
+            location = raw.types.InputPeerPhotoFileLocation(
+                peer=peer,
+                photo_id=file_id.media_id,
+                big=file_id.thumbnail_source == ThumbnailSource.CHAT_PHOTO_BIG,
+            )
+        elif file_type == FileType.PHOTO:
+            location = raw.types.InputPhotoFileLocation(
+                id=file_id.media_id,
+                access_hash=file_id.access_hash,
+                file_reference=file_id.file_reference,
+                thumb_size=file_id.thumbnail_size,
+            )
+        else:
+            location = raw.types.InputDocumentFileLocation(
+                id=file_id.media_id,
+                access_hash=file_id.access_hash,
+                file_reference=file_id.file_reference,
+                thumb_size=file_id.thumbnail_size,
+            )
+
+        current = 0
+        total = abs(limit) or (1 << 31) - 1
+        chunk_size = 1024 * 1024
+        offset_bytes = abs(offset) * chunk_size
+
+        dc_id = file_id.dc_id
+
+        try:
+            r = await self._invoke_transmission(
+                dc_id,
+                raw.functions.upload.GetFile(
+                    location=location,
+                    offset=offset_bytes,
+                    limit=chunk_size,
+                ),
+                sleep_threshold=30,
+                timeout=Config.TG_GETFILE_TIMEOUT,
+            )
+
+            if isinstance(r, raw.types.upload.File):
+                while True:
+                    chunk = r.bytes
+
+                    yield chunk
+
+                    current += 1
+                    offset_bytes += chunk_size
+
+                    if progress:
+                        func = functools.partial(
+                            progress,
+                            min(offset_bytes, file_size)
+                            if file_size != 0
+                            else offset_bytes,
+                            file_size,
+                            *progress_args,
                         )
 
-                location = raw.types.InputPeerPhotoFileLocation(
-                    peer=peer,
-                    photo_id=file_id.media_id,
-                    big=file_id.thumbnail_source == ThumbnailSource.CHAT_PHOTO_BIG,
-                )
-            elif file_type == FileType.PHOTO:
-                location = raw.types.InputPhotoFileLocation(
-                    id=file_id.media_id,
-                    access_hash=file_id.access_hash,
-                    file_reference=file_id.file_reference,
-                    thumb_size=file_id.thumbnail_size,
-                )
-            else:
-                location = raw.types.InputDocumentFileLocation(
-                    id=file_id.media_id,
-                    access_hash=file_id.access_hash,
-                    file_reference=file_id.file_reference,
-                    thumb_size=file_id.thumbnail_size,
+                        if inspect.iscoroutinefunction(progress):
+                            await func()
+                        else:
+                            await self.loop.run_in_executor(self.executor, func)
+
+                    if len(chunk) < chunk_size or current >= total:
+                        break
+
+                    r = await self._invoke_transmission(
+                        dc_id,
+                        raw.functions.upload.GetFile(
+                            location=location,
+                            offset=offset_bytes,
+                            limit=chunk_size,
+                        ),
+                        sleep_threshold=30,
+                        timeout=Config.TG_GETFILE_TIMEOUT,
+                    )
+
+            elif isinstance(r, raw.types.upload.FileCdnRedirect):
+                cdn_session = Session(
+                    self,
+                    r.dc_id,
+                    await Auth(self, r.dc_id, await self.storage.test_mode()).create(),
+                    await self.storage.test_mode(),
+                    is_media=True,
+                    is_cdn=True,
                 )
 
-            current = 0
-            total = abs(limit) or (1 << 31) - 1
-            chunk_size = 1024 * 1024
-            offset_bytes = abs(offset) * chunk_size
+                try:
+                    await cdn_session.start()
 
-            dc_id = file_id.dc_id
+                    while True:
+                        r2 = await self._invoke_transmission(
+                            r.dc_id,
+                            raw.functions.upload.GetCdnFile(
+                                file_token=r.file_token,
+                                offset=offset_bytes,
+                                limit=chunk_size,
+                            ),
+                            session=cdn_session,
+                            timeout=Config.TG_GETFILE_TIMEOUT,
+                        )
 
-            session = await self.session_pool.get_session(dc_id)
+                        if isinstance(r2, raw.types.upload.CdnFileReuploadNeeded):
+                            try:
+                                await self._invoke_transmission(
+                                    dc_id,
+                                    raw.functions.upload.ReuploadCdnFile(
+                                        file_token=r.file_token,
+                                        request_token=r2.request_token,
+                                    ),
+                                    timeout=Config.TG_GETFILE_TIMEOUT,
+                                )
+                            except VolumeLocNotFound:
+                                break
+                            else:
+                                continue
 
-            try:
-                r = await session.invoke(
-                    raw.functions.upload.GetFile(
-                        location=location,
-                        offset=offset_bytes,
-                        limit=chunk_size,
-                    ),
-                    sleep_threshold=30,
-                    timeout=Config.TG_GETFILE_TIMEOUT,
-                )
+                        chunk = r2.bytes
 
-                if isinstance(r, raw.types.upload.File):
-                    while True:
-                        chunk = r.bytes
+                        decrypted_chunk = aes.ctr256_decrypt(
+                            chunk,
+                            r.encryption_key,
+                            bytearray(
+                                r.encryption_iv[:-4]
+                                + (offset_bytes // 16).to_bytes(4, "big")
+                            ),
+                        )
 
-                        yield chunk
+                        hashes = await self._invoke_transmission(
+                            dc_id,
+                            raw.functions.upload.GetCdnFileHashes(
+                                file_token=r.file_token,
+                                offset=offset_bytes,
+                            ),
+                            timeout=Config.TG_GETFILE_TIMEOUT,
+                        )
+
+                        for i, h in enumerate(hashes):
+                            cdn_chunk = decrypted_chunk[
+                                h.limit * i : h.limit * (i + 1)
+                            ]
+                            CDNFileHashMismatch.check(
+                                h.hash == sha256(cdn_chunk).digest(),
+                                "h.hash == sha256(cdn_chunk).digest()",
+                            )
+
+                        yield decrypted_chunk
 
                         current += 1
                         offset_bytes += chunk_size
@@ -269,110 +426,10 @@ class ShadowBot(Client):
 
                         if len(chunk) < chunk_size or current >= total:
                             break
-
-                        r = await session.invoke(
-                            raw.functions.upload.GetFile(
-                                location=location,
-                                offset=offset_bytes,
-                                limit=chunk_size,
-                            ),
-                            sleep_threshold=30,
-                            timeout=Config.TG_GETFILE_TIMEOUT,
-                        )
-
-                elif isinstance(r, raw.types.upload.FileCdnRedirect):
-                    cdn_session = Session(
-                        self,
-                        r.dc_id,
-                        await Auth(self, r.dc_id, await self.storage.test_mode()).create(),
-                        await self.storage.test_mode(),
-                        is_media=True,
-                        is_cdn=True,
-                    )
-
-                    try:
-                        await cdn_session.start()
-
-                        while True:
-                            r2 = await cdn_session.invoke(
-                                raw.functions.upload.GetCdnFile(
-                                    file_token=r.file_token,
-                                    offset=offset_bytes,
-                                    limit=chunk_size,
-                                ),
-                                timeout=Config.TG_GETFILE_TIMEOUT,
-                            )
-
-                            if isinstance(r2, raw.types.upload.CdnFileReuploadNeeded):
-                                try:
-                                    await session.invoke(
-                                        raw.functions.upload.ReuploadCdnFile(
-                                            file_token=r.file_token,
-                                            request_token=r2.request_token,
-                                        ),
-                                        timeout=Config.TG_GETFILE_TIMEOUT,
-                                    )
-                                except VolumeLocNotFound:
-                                    break
-                                else:
-                                    continue
-
-                            chunk = r2.bytes
-
-                            decrypted_chunk = aes.ctr256_decrypt(
-                                chunk,
-                                r.encryption_key,
-                                bytearray(
-                                    r.encryption_iv[:-4]
-                                    + (offset_bytes // 16).to_bytes(4, "big")
-                                ),
-                            )
-
-                            hashes = await session.invoke(
-                                raw.functions.upload.GetCdnFileHashes(
-                                    file_token=r.file_token,
-                                    offset=offset_bytes,
-                                ),
-                                timeout=Config.TG_GETFILE_TIMEOUT,
-                            )
-
-                            for i, h in enumerate(hashes):
-                                cdn_chunk = decrypted_chunk[
-                                    h.limit * i : h.limit * (i + 1)
-                                ]
-                                CDNFileHashMismatch.check(
-                                    h.hash == sha256(cdn_chunk).digest(),
-                                    "h.hash == sha256(cdn_chunk).digest()",
-                                )
-
-                            yield decrypted_chunk
-
-                            current += 1
-                            offset_bytes += chunk_size
-
-                            if progress:
-                                func = functools.partial(
-                                    progress,
-                                    min(offset_bytes, file_size)
-                                    if file_size != 0
-                                    else offset_bytes,
-                                    file_size,
-                                    *progress_args,
-                                )
-
-                                if inspect.iscoroutinefunction(progress):
-                                    await func()
-                                else:
-                                    await self.loop.run_in_executor(self.executor, func)
-
-                            if len(chunk) < chunk_size or current >= total:
-                                break
-                    finally:
-                        await cdn_session.stop()
-            except pyrogram.StopTransmission:
-                raise
-            finally:
-                await self.session_pool.release_session(session)
+                finally:
+                    await cdn_session.stop()
+        except pyrogram.StopTransmission:
+            raise
 
     def cleanup_session(self):
         """
@@ -17,14 +17,21 @@ import asyncio
 import re
 import logging
 import tempfile
+import threading
 import time
 import math
-from datetime import datetime
+import random
+import functools
+import weakref
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
 from urllib.parse import urlparse
 
-import yt_dlp
+import aiofiles
+from bson.objectid import ObjectId
+from cachetools import TTLCache
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from pyrogram.errors import FloodWait, MessageIdInvalid
@@ -32,6 +39,10 @@ from pyrogram.errors import FloodWait, MessageIdInvalid
 from config import Config
 from utils.database import db
 
+if TYPE_CHECKING:
+    # yt_dlp is imported lazily where it's used - it takes ~200ms to load
+    import yt_dlp
+
 logger = logging.getLogger("indexing")
 MAX_FILE_SIZE = Config.MAX_FILE_SIZE_MB * 1024 * 1024  # Convert to bytes
 MAX_DURATION = Config.MAX_VIDEO_DURATION_HOURS * 3600  # Convert to seconds
@@ -50,19 +61,144 @@ YOUTUBE_PATTERNS = [
     r'(?:https?://)?(?:www\.)?youtube\.com/shorts/[\w-]+'
 ]
 
+# /stream_[ID] command (anchored both ends)
+_STREAM_RE = re.compile(r"^/stream_(\d+)$")
+# Plain text or /skip - other commands never reach handle_text
+_PLAIN_TEXT_RE = re.compile(r"^(?!\s*/)|^\s*/skip\s*$", re.IGNORECASE)
+
+# Proxy Rotation: PROXY_URLS (comma-separated) or single PROXY_URL/HTTP_PROXY
+# Set these in your HF Secrets as: http://user:pass@ip:port
+PROXIES = [
+    p.strip()
+    for p in (os.environ.get("PROXY_URLS") or os.environ.get("PROXY_URL") or os.environ.get("HTTP_PROXY") or "").split(",")
+    if p.strip()
+]
+# Proxies YouTube has flagged are benched for 4 hours, then retried
+faulty_proxies = TTLCache(maxsize=64, ttl=14400)
+PROXY_BLOCK_MARKERS = ("Sign in to confirm you're not a bot", "HTTP Error 403")
+
+# Log Channel forwarding: bounded concurrency + shared FloodWait deadline
+_LOG_SEM = asyncio.Semaphore(2)
+_LOG_FLOODWAIT_UNTIL = 0.0  # time.monotonic() before which nobody should send
+LOG_FORWARD_ATTEMPTS = 3
+
+# Concurrent YouTube downloads: a couple at full speed beats many throttled ones
+YT_DOWNLOAD_SEM = asyncio.Semaphore(2)
+_yt_waiting = 0  # Tasks currently queued behind YT_DOWNLOAD_SEM
+# Running/queued YouTube tasks - waiting happens here, not in an update worker
+# (strong refs, or the loop may garbage-collect a task mid-download)
+_yt_tasks: "set[asyncio.Task]" = set()
+
+# Final container extensions yt-dlp may leave in the temp dir
+_VIDEO_EXTS = frozenset({'mp4', 'webm', 'mkv', 'avi', 'mov'})
+
+# Shared yt-dlp network policy (single source of truth for every call)
+_BASE_YDL_OPTS = MappingProxyType({
+    'force_ipv4': True,      # CRITICAL FIX for Cloud Containers ("[Errno -5]" DNS errors)
+    'geo_bypass': True,
+    'nocheckcertificate': True,
+})
+# Download-only additions on top of the base policy
+_DOWNLOAD_YDL_OPTS = MappingProxyType({
+    **_BASE_YDL_OPTS,
+    'quiet': False,
+    # Anti-throttle: short sleeps + restart when YouTube drops us to a crawl
+    'sleep_interval': 1,
+    'max_sleep_interval': 5,
+    'sleep_requests': 1,
+    'socket_timeout': 30,
+    'ratelimit': Config.YT_RATELIMIT,
+    'throttledratelimit': Config.YT_THROTTLED_RATELIMIT,
+    'buffersize': 64 * 1024, # Write in the same granularity Pyrogram reads for upload
+})
+
+# Reused YoutubeDL instances for metadata-only calls, keyed by their options.
+# One set per worker thread - YoutubeDL is not thread-safe
+_ydl_local = threading.local()
+
+# Log Channel caption templates (filled with str.format_map)
+FORWARD_CAPTION_TPL = (
+    "🎬 **{name}**\n\n"
+    "💾 **Size:** {size_mb} MB\n"
+    "👤 **Uploaded By:** {user}\n"
+    "📅 **Date:** {date}\n\n"
+    "⚠️ **Files Provided By StreamVault**"
+)
+YT_LOG_CAPTION_TPL = (
+    "🎬 **{name}**\n\n"
+    "👤 **Task By:** {user}\n"
+    "🤖 **Uploaded By:** @{bot}\n"
+    "💿 **Quality:** {quality}p\n"
+    "📦 **Size:** {size}\n"
+    "📅 **Date:** {date}\n"
+)
+FILE_LOG_CAPTION_TPL = (
+    "🎬 **{name}**\n\n"
+    "👤 **Task By:** {user}\n"
+    "🤖 **Uploaded By:** @{bot}\n"
+    "💾 **Size:** {size}\n"
+    "📅 **Date:** {date}\n"
+)
+
+# /catalog and /search row templates (filled with str.format_map)
+CATALOG_ROW_TPL = "{i}. {emoji} **{name}** ({size})\n   └─ 🔗 /stream_{mid}\n\n"
+SEARCH_ROW_TPL = "{i}. {emoji} **{name}** ({size})\n   └─ 🔗 `/stream_{mid}`\n\n"
+FILE_TYPE_EMOJI = {"video": "🎬", "audio": "🎵"}  # Anything else gets 📄
+
+# Bound once so link building skips the Config attribute lookups
+_URL = Config.URL
+_LOG = Config.LOG_CHANNEL_ID
+
+def stream_link(message_id: int) -> str:
+    """Public stream URL for a LOG_CHANNEL message (always built from the current URL)"""
+    return f"{_URL}/stream/{_LOG}/{message_id}"
+
+def file_row(tpl: str, i: int, file: Dict[str, Any], size_str: Optional[str] = None) -> str:
+    """Render one /catalog or /search line for an indexed file"""
+    return tpl.format_map({
+        "i": i,
+        "emoji": FILE_TYPE_EMOJI.get(file.get('file_type'), "📄"),
+        "name": file.get('custom_name', 'Unknown'),
+        "size": size_str or f"{file.get('file_size', 0) >> 20} MB",
+        "mid": file.get('message_id'),
+    })
+
 # --- 1. VISUAL FORMATTING & PROGRESS HELPERS ---
 
+# Per-chat progress throttle and per-user progress message (no cross-user clobbering).
+# TTL-bounded like user_states so finished users' entries (and Message objects) expire
+PROGRESS_CACHE_TTL = 900
+PROGRESS_CACHE_MAX = 10_000
+_progress_last_update = TTLCache(maxsize=PROGRESS_CACHE_MAX, ttl=PROGRESS_CACHE_TTL)
+_progress_msgs = TTLCache(maxsize=PROGRESS_CACHE_MAX, ttl=PROGRESS_CACHE_TTL)
+
+# Min seconds between progress edits of the same chat (FloodWait guard)
+PROGRESS_INTERVAL = 5
+
+POWER_LABELS = ('', 'Ki', 'Mi', 'Gi', 'Ti')
+
+@functools.lru_cache(maxsize=1024)
 def humanbytes(size):
     """Convert bytes to human readable string (MB, GB)"""
-    if not size: return "0 B"
-    power = 2**10
-    n = 0
-    power_labels = {0: '', 1: 'Ki', 2: 'Mi', 3: 'Gi', 4: 'Ti'}
-    while size > power:
-        size /= power
-        n += 1
-    return f"{size:.2f} {power_labels[n]}B"
+    if not size or size < 0: return "0 B"
+    # Unit from the bit length (10 bits per step), no loop or log (speed may be float)
+    n = min(len(POWER_LABELS) - 1, max(0, (int(size).bit_length() - 1) // 10))
+    return f"{size / (1 << (n * 10)):.2f} {POWER_LABELS[n]}B"
 
+# (expires_at, "YYYY-MM-DD") - recomputed once per local day
+_today_cache = [0.0, ""]
+
+def today_str() -> str:
+    """Today's local date as YYYY-MM-DD, cached until next midnight"""
+    now = time.time()
+    if now >= _today_cache[0]:
+        lt = time.localtime(now)
+        _today_cache[1] = time.strftime('%Y-%m-%d', lt)
+        # mktime normalizes mday+1 past month/year ends
+        _today_cache[0] = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+    return _today_cache[1]
+
+@functools.lru_cache(maxsize=1024)
 def time_formatter(milliseconds: int) -> str:
     """Format milliseconds to MM:SS"""
     seconds, milliseconds = divmod(int(milliseconds), 1000)
@@ -71,16 +207,20 @@ def time_formatter(milliseconds: int) -> str:
     if hours: return f"{hours}h {minutes}m {seconds}s"
     return f"{minutes}m {seconds}s"
 
-async def show_progress(current, total, message, start_time, user_mention, stage="Task"):
+async def show_progress(current, total, message, start_time, user_mention, stage="Task", throttle=True):
     """
     Cool 'Hackery' Style Progress Bar with Refresh Button
+    
+    With throttle=True ticks inside the PROGRESS_INTERVAL window are dropped;
+    callers that already wait out the window themselves pass throttle=False.
     """
     now = time.time()
-    # Update only every 5 seconds to avoid FloodWait
-    if hasattr(show_progress, "last_update"):
-        if now - show_progress.last_update < 5 and current != total:
-            return
-    show_progress.last_update = now
+    # Update only every PROGRESS_INTERVAL seconds per chat to avoid FloodWait
+    chat_id = message.chat.id
+    last = _progress_last_update.get(chat_id)
+    if throttle and last is not None and now - last < PROGRESS_INTERVAL and current != total:
+        return
+    _progress_last_update[chat_id] = now
 
     percent = current * 100 / total
     elapsed = now - start_time
@@ -128,13 +268,14 @@ class FileState:
         message (Message): Original file upload message
         file_info (Dict): File metadata (ID, size, MIME type, etc.)
         custom_name (str): User-provided custom name (set later)
-        created_at (datetime): State creation timestamp
+        user_mention (str): Cached uploader mention for captions
     """
     def __init__(self, message, file_info):
         self.type = "file"
         self.message = message
         self.file_info = file_info
         self.custom_name = None
+        self.user_mention = message.from_user.mention
 
 class YouTubeState:
     def __init__(self, message, info_dict, url):
@@ -142,12 +283,65 @@ class YouTubeState:
         self.message = message
         self.info = info_dict # Full metadata from YT
         self.url = url
+        self.user_mention = message.from_user.mention # Cached for captions/progress
         self.quality = 720 # Default
         self.custom_name = None
         self.last_msg = None # Status message to update
-
-# Unified State Dictionary (Replaces upload_states)
-user_states = {}
+        self.progress_task = None # Single in-flight progress updater
+        self.progress_latest = None # Latest (current, total) not yet rendered
+
+# Files per /catalog page
+CATALOG_PAGE_SIZE = 50
+# "Next page" commands carry the last row's (created_at, _id) keyset cursor as
+# epoch milliseconds + ObjectId hex (/catalog 3 1700000000000 65f0...) so deep
+# pages use keyset instead of skip. Mongo stores ms, so the round-trip is exact
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+# Indexed file metadata is immutable after indexing -> cache hot /stream_ lookups
+_file_cache = TTLCache(maxsize=2048, ttl=600)
+# Per-message_id fetch locks (entries vanish once unused)
+_file_cache_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+# Per-user locks serializing state consumption (entries vanish once unused)
+_user_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+# Unified State Store (Replaces upload_states)
+# TTL-bounded so abandoned flows (and their multi-MB yt-dlp info dicts) get evicted
+USER_STATE_TTL = 900  # Seconds before an idle state expires (15 min)
+USER_STATE_MAX = 10_000
+user_states = TTLCache(maxsize=USER_STATE_MAX, ttl=USER_STATE_TTL)
+
+def get_user_lock(user_id: int) -> asyncio.Lock:
+    """Get (or create) the lock guarding this user's state"""
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = _user_locks[user_id] = asyncio.Lock()
+    return lock
+
+async def get_file_cached(message_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Read-through cache around db.get_file().
+    
+    Misses (file not found) are not cached, so a newly indexed file shows
+    up immediately. Entries are dropped on delete.
+    """
+    file_info = _file_cache.get(message_id)
+    if file_info is not None:
+        return file_info
+
+    # Miss: one fetch per message_id so a burst of clicks on the same link
+    # doesn't stampede Mongo, while different links are looked up in parallel
+    lock = _file_cache_locks.get(message_id)
+    if lock is None:
+        lock = _file_cache_locks[message_id] = asyncio.Lock()
+    async with lock:
+        file_info = _file_cache.get(message_id)  # May have been filled while waiting
+        if file_info is None:
+            file_info = await db.get_file(message_id)
+            if file_info:
+                _file_cache[message_id] = file_info
+    return file_info
 
 def is_youtube_url(text: str) -> bool:
     """
@@ -176,6 +370,55 @@ def is_youtube_url(text: str) -> bool:
     
     return any(re.match(pattern, text, re.IGNORECASE) for pattern in YOUTUBE_PATTERNS)
 
+def pick_proxy() -> Optional[str]:
+    """Pick a random proxy that isn't currently benched (None = direct connection)"""
+    healthy = [p for p in PROXIES if p not in faulty_proxies]
+    return random.choice(healthy) if healthy else None
+
+def is_proxy_blocked(error) -> bool:
+    """Check if a yt-dlp error means YouTube has flagged the current proxy"""
+    text = str(error)
+    return any(marker in text for marker in PROXY_BLOCK_MARKERS)
+
+def mark_proxy_faulty(proxy: Optional[str]):
+    """Bench a proxy so pick_proxy() skips it until the TTL expires"""
+    if proxy:
+        faulty_proxies[proxy] = True
+        logger.warning(f"Proxy flagged by YouTube, benched for 4h ({len(faulty_proxies)} benched)")
+
+def build_ydl_opts(base, proxy: Optional[str] = None, **extra) -> Dict[str, Any]:
+    """Copy a shared option set, add per-call fields and the chosen proxy"""
+    opts = {**base, **extra}
+    if proxy:
+        opts['proxy'] = proxy
+    return opts
+
+def get_cached_ydl(opts: Dict[str, Any]) -> "yt_dlp.YoutubeDL":
+    """
+    Get a YoutubeDL instance for these options, building it only once.
+    
+    Construction loads every extractor and the cookiejar, which dominates
+    a metadata-only lookup. Only use this for option sets without
+    per-request fields (outtmpl, progress_hooks) - those stay per call.
+    
+    Instances are cached per thread (call it from the worker thread that
+    uses the instance), so concurrent lookups never share one.
+    """
+    cache = getattr(_ydl_local, "cache", None)
+    if cache is None:
+        cache = _ydl_local.cache = {}
+    key = tuple(sorted(opts.items()))
+    ydl = cache.get(key)
+    if ydl is None:
+        import yt_dlp
+        ydl = cache[key] = yt_dlp.YoutubeDL(opts)
+    return ydl
+
+def probe_youtube_info(opts: Dict[str, Any], url: str) -> Dict[str, Any]:
+    """Metadata-only extract_info (blocking - called via asyncio.to_thread)"""
+    # process=False stops after metadata (no per-format resolution requests)
+    return get_cached_ydl(opts).extract_info(url, download=False, process=False)
+
 async def validate_file_size(file_size: int) -> tuple[bool, Optional[str]]:
     """
     Validate file size against configured limits.
@@ -204,113 +447,117 @@ async def validate_file_size(file_size: int) -> tuple[bool, Optional[str]]:
 async def validate_youtube_video(url: str) -> tuple[bool, Optional[str], Optional[Dict]]:
     """Validate YouTube video before download with Cloud-fixes (IPv4/Proxy)"""
     
-    # 1. Base Options: Force IPv4 to fix "[Errno -5]" DNS errors
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'extract_flat': True,
-        'force_ipv4': True,      # CRITICAL FIX for Cloud Containers
-        'geo_bypass': True,
-        'nocheckcertificate': True
-    }
-    
-    # 2. Proxy Check: Load PROXY_URL from secrets/env if available
-    # Set this in your HF Secrets as: http://user:pass@ip:port
-    proxy_url = os.environ.get("PROXY_URL") or os.environ.get("HTTP_PROXY")
-    if proxy_url:
-        ydl_opts['proxy'] = proxy_url
+    # Base network policy + a healthy proxy from the rotation (if any)
+    proxy_url = pick_proxy()
+    ydl_opts = build_ydl_opts(
+        _BASE_YDL_OPTS, proxy_url,
+        quiet=True,
+        no_warnings=True,
+        playlist_items='1',   # Cap work if a playlist URL slips through
+    )
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            # Check duration
-            duration = info.get('duration', 0)
-            if duration > MAX_DURATION:
-                hours = duration // 3600
-                return False, f"Video too long: {hours}h {(duration % 3600) // 60}m\n⚠️ Limit: {Config.MAX_VIDEO_DURATION_HOURS}h", None
-            
-            # Check file size (if available)
-            filesize = info.get('filesize') or info.get('filesize_approx', 0)
-            if filesize and filesize > MAX_FILE_SIZE:
-                size_mb = filesize // 1024 // 1024
-                return False, f"Video too large: {size_mb}MB\n⚠️ Limit: {Config.MAX_FILE_SIZE_MB}MB", None
-            
-            return True, None, info
+        # Network round-trip (maybe via proxy) - off the loop so streams keep flowing.
+        # Validation has no per-request options, so the thread's instance is reused
+        info = await asyncio.to_thread(probe_youtube_info, ydl_opts, url)
+        
+        # Check duration
+        duration = info.get('duration', 0)
+        if duration > MAX_DURATION:
+            hours = duration // 3600
+            return False, f"Video too long: {hours}h {(duration % 3600) // 60}m\n⚠️ Limit: {Config.MAX_VIDEO_DURATION_HOURS}h", None
+        
+        # Check file size (if available)
+        filesize = info.get('filesize') or info.get('filesize_approx', 0)
+        if filesize and filesize > MAX_FILE_SIZE:
+            size_mb = filesize // 1024 // 1024
+            return False, f"Video too large: {size_mb}MB\n⚠️ Limit: {Config.MAX_FILE_SIZE_MB}MB", None
+        
+        return True, None, info
             
     except Exception as e:
         logger.warning(f"YouTube Validation Error: {e}")
+        if is_proxy_blocked(e):
+            mark_proxy_faulty(proxy_url)
         return False, f"❌ Link Error: {str(e)[:50]}...", None
 
 async def forward_to_log_channel(client: Client, message: Message, custom_name: str) -> Optional[int]:
     """
     Forward file to log channel using copy().
     renames via caption and handles caching issues.
+    
+    Concurrency is capped by _LOG_SEM and a FloodWait on any forwarder
+    pauses all of them until the shared deadline passes (max 3 attempts).
     """
-    try:
-        # Create a clean caption with the Custom Name
-        file_size_mb = getattr(message.document or message.video or message.audio, "file_size", 0) // (1024 * 1024)
-        
-        caption_text = (
-            f"🎬 **{custom_name}**\n\n"
-            f"💾 **Size:** {file_size_mb} MB\n"
-            f"👤 **Uploaded By:** {message.from_user.mention}\n"
-            f"📅 **Date:** {datetime.now().strftime('%Y-%m-%d')}\n\n"
-            f"⚠️ **Files Provided By StreamVault**"
-        )
+    global _LOG_FLOODWAIT_UNTIL
 
-        # Using copy() handles media types automatically (Video vs Document)
-        sent = await message.copy(
-            chat_id=LOG_CHANNEL,
-            caption=caption_text
-        )
-        logger.info(f"✅ File copied to log channel: {sent.id}")
-        return sent.id
+    # Create a clean caption with the Custom Name
+    file_size_mb = getattr(message.document or message.video or message.audio, "file_size", 0) // (1024 * 1024)
+    
+    caption_text = FORWARD_CAPTION_TPL.format_map({
+        "name": custom_name,
+        "size_mb": file_size_mb,
+        "user": message.from_user.mention,
+        "date": today_str(),
+    })
+
+    async with _LOG_SEM:
+        for attempt in range(LOG_FORWARD_ATTEMPTS):
+            # Respect a FloodWait hit by any other forwarder
+            wait = _LOG_FLOODWAIT_UNTIL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
 
-    except (ValueError, KeyError) as e:
-        logger.error(
-            f"❌ Peer Invalid Error ({e}). The Bot doesn't 'know' the Log Channel ID yet.\n"
-            f"FIX: Go to your Log Channel ({LOG_CHANNEL}) and send '/start' or any message."
-        )
-        return None
-        
-    except FloodWait as e:
-        logger.warning(f"Flood wait during send: {e.value}s")
-        await asyncio.sleep(e.value + 5)
-        return await forward_to_log_channel(client, message, custom_name)
-        
-    except Exception as e:
-        logger.error(f"Failed to send to log channel: {e}", exc_info=True)
-        return None
+            try:
+                # Using copy() handles media types automatically (Video vs Document)
+                sent = await message.copy(
+                    chat_id=LOG_CHANNEL,
+                    caption=caption_text
+                )
+                logger.info(f"✅ File copied to log channel: {sent.id}")
+                return sent.id
+
+            except (ValueError, KeyError) as e:
+                logger.error(
+                    f"❌ Peer Invalid Error ({e}). The Bot doesn't 'know' the Log Channel ID yet.\n"
+                    f"FIX: Go to your Log Channel ({LOG_CHANNEL}) and send '/start' or any message."
+                )
+                return None
+                
+            except FloodWait as e:
+                logger.warning(f"Flood wait during send: {e.value}s (attempt {attempt + 1}/{LOG_FORWARD_ATTEMPTS})")
+                _LOG_FLOODWAIT_UNTIL = max(_LOG_FLOODWAIT_UNTIL, time.monotonic() + e.value + 5)
+                
+            except Exception as e:
+                logger.error(f"Failed to send to log channel: {e}", exc_info=True)
+                return None
+
+    logger.error("Giving up on log channel forward after repeated FloodWait")
+    return None
 
 async def download_youtube_video(url: str, user_id: int, progress_hook=None) -> Optional[str]:
     """Download YouTube video with robust network handling (IPv4/Proxy/Cookies)"""
     temp_dir = tempfile.mkdtemp()
     
-    # 1. Base Options
-    ydl_opts = {
-        'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
-        'format': 'best[filesize<500M]/best', # Prioritize size limit
-        'quiet': False,
-        'retries': 10,
-        'fragment_retries': 10,
-        'force_ipv4': True,      # CRITICAL FIX
-        'geo_bypass': True,
-        'nocheckcertificate': True,
-        'progress_hooks': [progress_hook] if progress_hook else [],
-    }
-    
-    # 2. Proxy Check (from Secrets)
-    proxy_url = os.environ.get("PROXY_URL") or os.environ.get("HTTP_PROXY")
+    # 1. Base Options + healthy proxy from rotation
+    proxy_url = pick_proxy()
+    ydl_opts = build_ydl_opts(
+        _DOWNLOAD_YDL_OPTS, proxy_url,
+        outtmpl=os.path.join(temp_dir, '%(title)s.%(ext)s'),
+        format='best[filesize<500M]/best', # Prioritize size limit
+        retries=10,
+        fragment_retries=10,
+        progress_hooks=[progress_hook] if progress_hook else [],
+    )
     if proxy_url:
         logger.info(f"[USER {user_id}] Using Proxy for download.")
-        ydl_opts['proxy'] = proxy_url
 
     # 3. Cookie Handling (Optional but recommended)
     if os.path.exists("cookies.txt"):
         ydl_opts['cookiefile'] = "cookies.txt"
 
     # 4. Attempt Download
+    import yt_dlp
     try:
         logger.info(f"[USER {user_id}] Starting YT download (Proxy: {bool(proxy_url)}, IPv4: True)")
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
@@ -322,26 +569,31 @@ async def download_youtube_video(url: str, user_id: int, progress_hook=None) ->
                 return filename
             
             # Fallback: Search dir for specific extensions if filename match fails
-            for file in os.listdir(temp_dir):
-                if file.endswith(('.mp4', '.webm', '.mkv', '.avi', '.mov')):
-                    return os.path.join(temp_dir, file)
+            with os.scandir(temp_dir) as entries:
+                for entry in entries:
+                    if entry.name.rpartition('.')[2] in _VIDEO_EXTS:
+                        return entry.path
                     
             return None
 
     except Exception as e:
         logger.error(f"[USER {user_id}] Download Error: {e}")
+        if is_proxy_blocked(e):
+            mark_proxy_faulty(proxy_url)
         return None
 
 async def send_progress_message(client: Client, message: Message, text: str) -> Message:
     """Send or edit progress message"""
-    if hasattr(send_progress_message, 'progress_msg') and send_progress_message.progress_msg:
+    user_id = message.from_user.id
+    progress_msg = _progress_msgs.get(user_id)
+    if progress_msg:
         try:
-            return await send_progress_message.progress_msg.edit_text(text)
+            return await progress_msg.edit_text(text)
         except:
             pass
     
-    send_progress_message.progress_msg = await message.reply_text(text, quote=True)
-    return send_progress_message.progress_msg
+    progress_msg = _progress_msgs[user_id] = await message.reply_text(text, quote=True)
+    return progress_msg
 
 # --- UPDATED: Allow /start in Log Channel to cache Peer ID ---
 @Client.on_message((filters.private | filters.chat(LOG_CHANNEL)) & filters.command("start"))
@@ -537,44 +789,43 @@ async def handle_file_upload(client: Client, message: Message):
         )
 
 
-@Client.on_message(filters.private & filters.text)
+@Client.on_message(filters.private & filters.text & filters.regex(_PLAIN_TEXT_RE))
 async def handle_text(client: Client, message: Message):
     text = message.text.strip()
     
-    # 1. Ignore Commands / YT Check / Renaming check... (Keep your previous logic)
-    if text.startswith("/") and text.lower() != "/skip":
-        message.continue_propagation()
-        return
-
+    # 1. YT Check / Renaming check (commands other than /skip are filtered out above)
     if is_youtube_url(text):
         await handle_youtube_download(client, message)
         return
 
     # 2. State Routing
+    # Claim the state atomically (pop) under a per-user lock, so a second
+    # message can't double-process it. Only the claim is locked - a second
+    # message must not sit on an update worker through the whole task.
     user_id = message.from_user.id
-    if user_id in user_states:
-        state = user_states[user_id]
-        
-        # Naming Logic...
-        if text.lower() == "/skip":
-            if state.type == "file": name = state.file_info["file_name"]
-            else: name = state.info.get("title", f"Video_{int(time.time())}")
-        else:
-            name = text
+    async with get_user_lock(user_id):
+        state = user_states.pop(user_id, None)
+    if state is None:
+        return
+    
+    # Naming Logic...
+    if text.lower() == "/skip":
+        if state.type == "file": name = state.file_info["file_name"]
+        else: name = state.info.get("title", f"Video_{int(time.time())}")
+    else:
+        name = text
 
-        state.custom_name = str(name).replace("/", "_")[:200]
-        
-        # Route
-        if state.type == "file":
-            # Direct files don't fail, so we can run and clean up.
-            await process_file_final(client, state)
-            del user_states[user_id] # Clean file state
-            
-        elif state.type == "youtube":
-            # YT might need to retry, so 'process_youtube_final' will handle the 'del user_states'
-            await process_youtube_final(client, state)
+    state.custom_name = str(name).replace("/", "_")[:200]
+    
+    # Route
+    if state.type == "file":
+        await process_file_final(client, state)
         
-        return
+    elif state.type == "youtube":
+        # YT might need to retry, so a failed download puts the state back.
+        # Runs as a task: queueing behind YT_DOWNLOAD_SEM must not pin one
+        # of the few Pyrogram update workers for the whole download
+        start_youtube_task(client, state)
 
 async def handle_youtube_download(client: Client, message: Message):
     """
@@ -606,8 +857,9 @@ async def handle_youtube_download(client: Client, message: Message):
     ]
     
     # 3. Store Info (So we can download it AFTER renaming)
-    user_states[user_id] = YouTubeState(message, info, url)
-    user_states[user_id].last_msg = status_msg
+    state = YouTubeState(message, info, url)
+    state.last_msg = status_msg
+    user_states[user_id] = state
     
     title = info.get('title', 'Unknown Video')
     duration_str = time_formatter(info.get('duration', 0) * 1000)
@@ -619,7 +871,45 @@ async def handle_youtube_download(client: Client, message: Message):
         reply_markup=InlineKeyboardMarkup(buttons)
     )
     
+def start_youtube_task(client: Client, state: YouTubeState) -> asyncio.Task:
+    """Run process_youtube_final in the background, tracked in _yt_tasks"""
+    task = asyncio.create_task(process_youtube_final(client, state))
+    _yt_tasks.add(task)
+    task.add_done_callback(_yt_task_done)
+    return task
+
+def _yt_task_done(task: asyncio.Task):
+    # No handler awaits these tasks, so surface failures here
+    _yt_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("YouTube task failed", exc_info=task.exception())
+
 async def process_youtube_final(client: Client, state: YouTubeState):
+    """Wait for a free download slot (showing queue position), then run the task."""
+    global _yt_waiting
+
+    if YT_DOWNLOAD_SEM.locked():
+        _yt_waiting += 1
+        try:
+            try:
+                await state.last_msg.edit_text(
+                    f"⏳ **Queued...**\n"
+                    f"Position: {_yt_waiting}\n"
+                    f"Other downloads are running, yours starts automatically."
+                )
+            except: pass
+            await YT_DOWNLOAD_SEM.acquire()
+        finally:
+            _yt_waiting -= 1
+    else:
+        await YT_DOWNLOAD_SEM.acquire()
+
+    try:
+        await run_youtube_task(client, state)
+    finally:
+        YT_DOWNLOAD_SEM.release()
+
+async def run_youtube_task(client: Client, state: YouTubeState):
     """Download loop. On failure, asks user to retry Quality."""
     msg = state.last_msg
     try:
@@ -628,21 +918,46 @@ async def process_youtube_final(client: Client, state: YouTubeState):
         msg = await state.message.reply_text("⏳ **Starting...**")
 
     start_time = time.time()
-    user_mention = state.message.from_user.mention
+    user_mention = state.user_mention
     
-    # Sync Hook wrapper
+    # Coalescing consumer owns the throttle: it sleeps until the next allowed
+    # edit, then renders only the newest tick (ticks meanwhile just overwrite it)
+    async def drain_progress():
+        while state.progress_latest:
+            last = _progress_last_update.get(msg.chat.id)
+            if last is not None:
+                await asyncio.sleep(max(0.0, last + PROGRESS_INTERVAL - time.time()))
+            current, total = state.progress_latest
+            state.progress_latest = None
+            await show_progress(current, total, msg, start_time, user_mention,
+                                stage=f"Downloading ({state.quality}p)", throttle=False)
+
+    # Runs on the loop: only one progress task alive at a time
+    def ensure_drain():
+        if state.progress_task is None or state.progress_task.done():
+            state.progress_task = asyncio.create_task(drain_progress())
+
+    # Sync Hook wrapper - yt-dlp calls it from the download worker thread.
+    # Only an empty -> pending transition wakes the loop; while the consumer
+    # waits out the window, ticks overwrite progress_latest and schedule nothing.
     def dl_progress(d):
         if d['status'] == 'downloading':
             try:
                 current = d.get('downloaded_bytes', 0)
                 total = d.get('total_bytes') or d.get('total_bytes_estimate', 1)
-                client.loop.create_task(
-                    show_progress(current, total, msg, start_time, user_mention, stage=f"Downloading ({state.quality}p)")
-                )
+                was_idle = state.progress_latest is None
+                state.progress_latest = (current, total)
+                if was_idle:
+                    client.loop.call_soon_threadsafe(ensure_drain)
             except: pass
 
     # 1. Attempt Download
     file_path = await download_yt_res(state.url, state.quality, dl_progress)
+    # Download stage is over - a pending tick must not overwrite the next status
+    if state.progress_task is not None:
+        state.progress_task.cancel()
+        state.progress_task = None
+    state.progress_latest = None
     
     # --- FAILURE HANDLER (Retry Logic) ---
     if not file_path:
@@ -658,8 +973,10 @@ async def process_youtube_final(client: Client, state: YouTubeState):
             f"👇 **Please select a lower quality:**",
             reply_markup=InlineKeyboardMarkup(buttons)
         )
-        # CRITICAL: We DO NOT delete 'user_states[id]' here. 
-        # The user stays in the state to click the new button.
+        # CRITICAL: Put the state back (it was popped by handle_text).
+        # The user stays in the state to click the new button - unless they
+        # started a newer flow meanwhile, which must not be clobbered.
+        user_states.setdefault(state.message.from_user.id, state)
         return
 
     # --- SUCCESS HANDLER ---
@@ -673,31 +990,31 @@ async def process_youtube_final(client: Client, state: YouTubeState):
     except:
         bot_usr = "StreamVaultBot"
     
-    log_caption = (
-        f"🎬 **{state.custom_name}**\n\n"
-        f"👤 **Task By:** {state.message.from_user.mention}\n"
-        f"🤖 **Uploaded By:** @{bot_usr}\n"
-        f"💿 **Quality:** {state.quality}p\n"
-        f"📦 **Size:** {humanbytes(f_size)}\n"
-        f"📅 **Date:** {datetime.now().strftime('%Y-%m-%d')}\n"
-    )
+    log_caption = YT_LOG_CAPTION_TPL.format_map({
+        "name": state.custom_name,
+        "user": state.user_mention,
+        "bot": bot_usr,
+        "quality": state.quality,
+        "size": humanbytes(f_size),
+        "date": today_str(),
+    })
 
     try:
         start_up = time.time()
         async def up_progress(current, total):
             await show_progress(current, total, msg, start_up, user_mention, stage="Uploading to Cloud")
 
-        with open(file_path, 'rb') as f:
-            sent = await client.send_document(
-                chat_id=int(Config.LOG_CHANNEL_ID),
-                document=f,
-                file_name=file_name,
-                caption=log_caption,
-                progress=up_progress
-            )
+        # Pass the path so Pyrogram streams the file in its own chunked reader
+        sent = await client.send_document(
+            chat_id=int(Config.LOG_CHANNEL_ID),
+            document=file_path,
+            file_name=file_name,
+            caption=log_caption,
+            progress=up_progress
+        )
         
         # 3. DB Save
-        link = f"{Config.URL}/stream/{Config.LOG_CHANNEL_ID}/{sent.id}"
+        link = stream_link(sent.id)
         file_data = {
             "message_id": sent.id,
             "custom_name": state.custom_name,
@@ -707,7 +1024,7 @@ async def process_youtube_final(client: Client, state: YouTubeState):
             "uploaded_by": state.message.from_user.id,
             "stream_link": link
         }
-        await db.save_file(file_data)
+        await db.enqueue_file(file_data)
         
         await msg.edit_text(
             f"✅ **Success!**\n"
@@ -716,9 +1033,6 @@ async def process_youtube_final(client: Client, state: YouTubeState):
             f"🔗 **[Click Here to Stream]({link})**",
             disable_web_page_preview=True
         )
-        
-        # CLEANUP STATE (Only on Success)
-        del user_states[state.message.from_user.id]
 
     except Exception as e:
         logger.error(f"YT Process: {e}")
@@ -742,23 +1056,19 @@ async def download_yt_res(url, height, hook):
     else:
         fmt_str = "best"
     
-    ydl_opts = {
-        'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
-        'format': fmt_str,
-        'quiet': False,
-        'force_ipv4': True,
-        'geo_bypass': True,
-        'nocheckcertificate': True,
-        'retries': 3, # Lower retries since we handle logic manually
-        'progress_hooks': [hook] if hook else [],
-        'extractor_args': {'youtube': {'player_client': ['android', 'ios']}}
-    }
-
-    proxy = os.environ.get("PROXY_URL") or os.environ.get("HTTP_PROXY")
-    if proxy: ydl_opts['proxy'] = proxy
-
-    # Helper to run the download
+    proxy = pick_proxy()
+    ydl_opts = build_ydl_opts(
+        _DOWNLOAD_YDL_OPTS, proxy,
+        outtmpl=os.path.join(temp_dir, '%(title)s.%(ext)s'),
+        format=fmt_str,
+        retries=3, # Lower retries since we handle logic manually
+        progress_hooks=[hook] if hook else [],
+        extractor_args={'youtube': {'player_client': ['android', 'ios']}},
+    )
+
+    # Helper to run the download (blocking - called via asyncio.to_thread)
     def run_download(options):
+        import yt_dlp
         try:
             with yt_dlp.YoutubeDL(options) as ydl:
                 info = ydl.extract_info(url, download=True)
@@ -768,11 +1078,25 @@ async def download_yt_res(url, height, hook):
 
     # Attempt 1: Standard
     logger.info(f"Attempting download for {height}p (No Cookies)...")
-    result = run_download(ydl_opts)
+    result = await asyncio.to_thread(run_download, ydl_opts)
     
     # Check success
     if isinstance(result, str) and os.path.exists(result):
         return result
+
+    # Proxy flagged -> bench it and retry once immediately with another one
+    if proxy and isinstance(result, Exception) and is_proxy_blocked(result):
+        mark_proxy_faulty(proxy)
+        proxy = pick_proxy()
+        if proxy:
+            ydl_opts['proxy'] = proxy
+        else:
+            ydl_opts.pop('proxy', None)
+        logger.warning(f"Retrying {height}p with {'another proxy' if proxy else 'direct connection'}...")
+        result = await asyncio.to_thread(run_download, ydl_opts)
+
+        if isinstance(result, str) and os.path.exists(result):
+            return result
         
     # Check for 403 Forbidden (needs Cookies)
     if isinstance(result, Exception) and "HTTP Error 403" in str(result):
@@ -784,12 +1108,13 @@ async def download_yt_res(url, height, hook):
         created = False
         
         if secret_cookies:
-            with open(cookie_path, "w") as f: f.write(secret_cookies)
+            async with aiofiles.open(cookie_path, "w") as f:
+                await f.write(secret_cookies)
             ydl_opts['cookiefile'] = cookie_path
             created = True
             
             # Attempt 2
-            result = run_download(ydl_opts)
+            result = await asyncio.to_thread(run_download, ydl_opts)
             
             # Cleanup Secret File
             if created and os.path.exists(cookie_path):
@@ -814,14 +1139,13 @@ async def process_file_final(client: Client, state: FileState):
         bot_usr = "StreamVaultBot"
     
     # 1. Prepare Styled Caption (The "New Look")
-    size_str = humanbytes(state.file_info["file_size"])
-    log_caption = (
-        f"🎬 **{state.custom_name}**\n\n"
-        f"👤 **Task By:** {state.message.from_user.mention}\n"
-        f"🤖 **Uploaded By:** @{bot_usr}\n"
-        f"💾 **Size:** {size_str}\n"
-        f"📅 **Date:** {datetime.now().strftime('%Y-%m-%d')}\n"
-    )
+    log_caption = FILE_LOG_CAPTION_TPL.format_map({
+        "name": state.custom_name,
+        "user": state.user_mention,
+        "bot": bot_usr,
+        "size": humanbytes(state.file_info["file_size"]),
+        "date": today_str(),
+    })
 
     try:
         # 2. Forward to Log (Using copy + new caption)
@@ -832,7 +1156,7 @@ async def process_file_final(client: Client, state: FileState):
         )
         
         # 3. Save to Database
-        link = f"{Config.URL}/stream/{LOG_CHANNEL}/{log_msg.id}"
+        link = stream_link(log_msg.id)
         file_data = {
             "message_id": log_msg.id,
             "custom_name": state.custom_name,
@@ -841,7 +1165,7 @@ async def process_file_final(client: Client, state: FileState):
             "uploaded_by": state.message.from_user.id,
             "stream_link": link
         }
-        await db.save_file(file_data)
+        await db.enqueue_file(file_data)
         
         # 4. Success Message (Hidden Link Style)
         await msg.edit_text(
@@ -857,10 +1181,6 @@ async def process_file_final(client: Client, state: FileState):
     except Exception as e:
         logger.error(f"File process error: {e}")
         await msg.edit_text(f"❌ System Error: {e}")
-
-# CLEANUP (Since this flow always ends here)
-    if state.message.from_user.id in user_states:
-        del user_states[state.message.from_user.id]
         
 # Callback Queries -----
 
@@ -871,16 +1191,16 @@ async def handle_yt_buttons(client: Client, callback: CallbackQuery):
     data = callback.data
     
     if data == "yt_cancel":
-        if user_id in user_states: del user_states[user_id]
+        user_states.pop(user_id, None)
         await callback.message.edit_text("❌ **Task Cancelled.**")
         return
 
     # Check State validity
-    if user_id not in user_states or user_states[user_id].type != "youtube":
+    state = user_states.get(user_id)
+    if state is None or state.type != "youtube":
         await callback.answer("⚠️ Session expired.", show_alert=True)
         return
 
-    state = user_states[user_id]
     target_res = int(data.split("_")[1]) # Extracts 1080 from "yt_1080"
     state.quality = target_res
     
@@ -899,42 +1219,70 @@ async def handle_yt_buttons(client: Client, callback: CallbackQuery):
 async def cancel_state_handler(client: Client, callback: CallbackQuery):
     """Generic Cancel button handler for any State (File or YT)"""
     user_id = callback.from_user.id
-    if user_id in user_states:
-        del user_states[user_id]
+    if user_states.pop(user_id, None) is not None:
         await callback.message.edit_text("❌ **Process Cancelled by User.**")
-    else:
-        await callback.answer("Nothing to cancel.", show_alert=True)
+        return
 
-async def forward_file_to_log_channel(client: Client, file_path: str, file_name: str, video_info: Dict) -> Optional[int]:
-    """Forward downloaded file to log channel"""
+    # State already expired from the TTL store - drop the stale button too
+    await callback.answer("Nothing to cancel.", show_alert=True)
     try:
-        # Send file to log channel
-        with open(file_path, 'rb') as f:
+        await callback.message.edit_text("⌛ **Session expired.**")
+    except Exception:
+        pass
+
+async def forward_file_to_log_channel(client: Client, file_path: str, file_name: str, video_info: Dict) -> Optional[int]:
+    """Forward downloaded file to log channel (retries FloodWait up to LOG_FORWARD_ATTEMPTS times)"""
+    for attempt in range(LOG_FORWARD_ATTEMPTS):
+        try:
+            # Send by path: Pyrogram reads the file in chunks itself (no sync open() here)
             sent_msg = await client.send_document(
                 chat_id=Config.LOG_CHANNEL_ID,
-                document=f,
+                document=file_path,
                 file_name=file_name,
                 caption=f"📹 {video_info.get('title', file_name)}\n🔗 Source: YouTube\n👤 User: From private upload"
             )
-        return sent_msg.id
-        
-    except FloodWait as e:
-        logger.warning(f"Flood wait during YouTube upload: {e.value}s")
-        await asyncio.sleep(e.value + 5)
-        return await forward_file_to_log_channel(client, file_path, file_name, video_info)
-    except Exception as e:
-        logger.error(f"Failed to forward YouTube file: {e}")
-        return None
+            return sent_msg.id
+            
+        except FloodWait as e:
+            logger.warning(f"Flood wait during YouTube upload: {e.value}s (attempt {attempt + 1}/{LOG_FORWARD_ATTEMPTS})")
+            await asyncio.sleep(e.value + 5)
+        except Exception as e:
+            logger.error(f"Failed to forward YouTube file: {e}")
+            return None
+
+    logger.error("Giving up on YouTube upload after repeated FloodWait")
+    return None
 
 @Client.on_message(filters.private & filters.command("catalog"))
 async def handle_catalog(client: Client, message: Message):
-    """Handle /catalog command"""
+    """Handle /catalog [page] [cursor] command"""
     try:
+        # Parse optional page number (/catalog 2) and keyset cursor (/catalog 2 <ms> <oid>)
+        args = message.command[1:]
+        page = 1
+        if args and args[0].isdigit():
+            page = max(1, int(args[0]))
+        cursor = None
+        if page > 1 and len(args) > 2 and args[1].isdigit() and ObjectId.is_valid(args[2]):
+            cursor = (_EPOCH + int(args[1]) * _MS, ObjectId(args[2]))
+
         # Get files from database
-        files = await db.get_catalog(limit=50)
-        total_count = await db.get_catalog_count()
+        if cursor is not None:
+            (files, next_cursor), total_count = await asyncio.gather(
+                db.get_catalog_after(cursor, limit=CATALOG_PAGE_SIZE),
+                db.get_catalog_count(),
+            )
+        else:
+            # Typed page number - skip-based jump
+            files, total_count = await db.get_catalog_with_count(
+                limit=CATALOG_PAGE_SIZE, skip=(page - 1) * CATALOG_PAGE_SIZE
+            )
+            next_cursor = db.catalog_cursor(files[-1]) if len(files) == CATALOG_PAGE_SIZE else None
         
         if not files:
+            if page > 1:
+                await message.reply_text(f"📚 **Page {page} is empty**\n\nTry `/catalog 1`", quote=True)
+                return
             await message.reply_text(
                 "📚 **Your Archive is empty**\n\n"
                 "Send me a file or YouTube link to get started!",
@@ -943,32 +1291,25 @@ async def handle_catalog(client: Client, message: Message):
             return
         
         # Format catalog message
-        catalog_text = f"📚 **Your Archive** ({total_count} files):\n\n"
+        total_pages = max(1, math.ceil(total_count / CATALOG_PAGE_SIZE))
+        parts = [f"📚 **Your Archive** ({total_count} files) - Page {page}/{total_pages}:\n\n"]
+        start_index = (page - 1) * CATALOG_PAGE_SIZE
         
-        for i, file in enumerate(files, 1):
-            size_mb = file.get('file_size', 0) // 1024 // 1024
-            size_str = f"{size_mb} MB"
-            
+        for i, file in enumerate(files, start_index + 1):
+            size_mb = file.get('file_size', 0) >> 20
             # Add warning for large files
-            if size_mb > 100:
-                size_str += " ⚠️ Large file"
-            
-            # Add file type emoji
-            file_type = file.get('file_type', 'file')
-            emoji = "🎬" if file_type == "video" else "🎵" if file_type == "audio" else "📄"
-
-            # --- DYNAMIC LINK GENERATION (Fixes old broken links) ---
-            # We construct the link fresh using the current Config.URL
-            # This fixes issues where DB has 'localhost' or old URLs
-            msg_id = file.get('message_id')
-            # The click handler below uses /stream_[ID], so it auto-generates correctly
-            
-            catalog_text += f"{i}. {emoji} **{file.get('custom_name', 'Unknown')}** ({size_str})\n"
-            catalog_text += f"   └─ 🔗 /stream_{file.get('message_id')}\n\n"
+            size_str = f"{size_mb} MB ⚠️ Large file" if size_mb > 100 else f"{size_mb} MB"
+
+            # Links are /stream_[ID] commands, so the click handler builds a fresh URL
+            # from the current Config.URL (fixes old 'localhost' links stored in DB)
+            parts.append(file_row(CATALOG_ROW_TPL, i, file, size_str))
         
-        catalog_text += f"💡 **Use:** `/stream_[ID]` to get the direct link"
+        parts.append("💡 **Use:** `/stream_[ID]` to get the direct link")
+        if page < total_pages and next_cursor is not None:
+            ts, oid = next_cursor
+            parts.append(f"\n➡️ **Next page:** `/catalog {page + 1} {(ts - _EPOCH) // _MS} {oid}`")
         
-        await message.reply_text(catalog_text, quote=True)
+        await message.reply_text("".join(parts), quote=True)
         
     except Exception as e:
         logger.error(f"Catalog command failed: {e}")
@@ -977,27 +1318,28 @@ async def handle_catalog(client: Client, message: Message):
             quote=True
         )
         
-@Client.on_message(filters.private & filters.regex(r"^/stream_(\d+)"))
+@Client.on_message(filters.private & filters.regex(_STREAM_RE))
 async def handle_stream_command(client: Client, message: Message):
     """Handle dynamic /stream_[id] commands"""
     try:
-        # Extract message_id from the regex match (Group 1)
+        # Extract message_id (Group 1) - the filter guarantees a match
+        # filters.regex stores its match on message.matches (text or caption)
         message_id = int(message.matches[0].group(1))
         
-        # Verify file exists in DB
-        file_info = await db.get_file(message_id)
+        # Verify file exists in DB (served from RAM for hot links)
+        file_info = await get_file_cached(message_id)
         if not file_info:
             await message.reply_text("❌ **File not found in database.**", quote=True)
             return
             
         # --- GENERATE FRESH LINK ---
-        stream_link = f"{Config.URL}/stream/{Config.LOG_CHANNEL_ID}/{message_id}"
+        link = stream_link(message_id)
         custom_name = file_info.get('custom_name', 'Video')
         
         # Reply with the hidden link
         await message.reply_text(
             f"🎬 **{custom_name}**\n\n"
-            f"🔗 **[Click Here to Stream]({stream_link})**",
+            f"🔗 **[Click Here to Stream]({link})**",
             quote=True,
             disable_web_page_preview=True
         )
@@ -1055,6 +1397,7 @@ async def delete_callback_handler(client: Client, callback: CallbackQuery):
     if data.startswith("del_conf_"):
         mid = int(data.split("_")[2])
         if await db.delete_file(mid):
+            _file_cache.pop(mid, None)
             await callback.message.edit_text(f"✅ **Deleted Successfully!**\nID: `{mid}` has been removed.")
         else:
             await callback.message.edit_text("❌ Error: Could not delete (maybe already gone).")
@@ -1085,23 +1428,10 @@ async def handle_search(client: Client, message: Message):
             return
         
         # Format results
-        search_text = f"🔍 **Search Results** for `{query}` ({len(files)} files):\n\n"
-        
-        for i, file in enumerate(files, 1):
-            size_mb = file.get('file_size', 0) // 1024 // 1024
-            size_str = f"{size_mb} MB"
-            
-            # Add file type emoji
-            file_type = file.get('file_type', 'file')
-            emoji = "🎬" if file_type == "video" else "🎵" if file_type == "audio" else "📄"
-
-            # DYNAMIC GENERATION via Command ID
-            msg_id = file.get('message_id')
-            
-            search_text += f"{i}. {emoji} **{file.get('custom_name', 'Unknown')}** ({size_str})\n"
-            search_text += f"   └─ 🔗 `/stream_{file.get('message_id')}`\n\n"
+        parts = [f"🔍 **Search Results** for `{query}` ({len(files)} files):\n\n"]
+        parts.extend(file_row(SEARCH_ROW_TPL, i, file) for i, file in enumerate(files, 1))
         
-        await message.reply_text(search_text, quote=True)
+        await message.reply_text("".join(parts), quote=True)
         
     except Exception as e:
         logger.error(f"Search command failed: {e}")
@@ -1,84 +1,294 @@
 import asyncio
+import hashlib
+import hmac
 import logging
-from collections import defaultdict
-from typing import Dict, List
+import os
+import random
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
 
+from pyrogram.crypto import aes
 from pyrogram.session import Auth, Session
 from pyrogram import raw
 
+from config import Config
+from utils.database import db
+
 logger = logging.getLogger("SessionPool")
 
+# Health check / reaper tuning (seconds)
+PING_AFTER_IDLE = 300     # Ping a pooled session before reuse if idle longer than this
+PING_TIMEOUT = 2
+REAP_INTERVAL = 60
+REAP_AFTER_IDLE = 1800    # Stop pooled sessions idle longer than this
+
+# Sessions kept per DC. get_file borrows one per GetFile under a transmission
+# permit, so at most MAX_CONCURRENT_TRANSMISSIONS are ever in use - pooling
+# that many means bursts reuse sessions instead of starting/stopping them
+MAX_POOLED_PER_DC = max(3, Config.MAX_CONCURRENT_TRANSMISSIONS)
+# Main-DC sessions started at boot, so the first stream's parallel segments
+# don't each pay a session handshake
+PREWARM_SESSIONS = Config.STREAM_PREFETCH_WORKERS
+
+# Persisted auth keys are sealed as iv | AES-256-CTR(key) | HMAC-SHA256 tag,
+# with both keys derived from the bot's own secrets (never stored in Mongo)
+_SEAL_SECRET = (Config.BOT_TOKEN + Config.API_HASH).encode()
+_SEAL_ENC_KEY = hashlib.sha256(b"auth-key-enc:" + _SEAL_SECRET).digest()
+_SEAL_MAC_KEY = hashlib.sha256(b"auth-key-mac:" + _SEAL_SECRET).digest()
+_SEAL_IV_LEN = 16
+_SEAL_TAG_LEN = 32
+
+
+def seal_auth_key(dc_id: int, auth_key: bytes) -> bytes:
+    """Encrypt-then-MAC an auth key for storage (the tag also binds the DC id)."""
+    iv = os.urandom(_SEAL_IV_LEN)
+    body = iv + aes.ctr256_encrypt(auth_key, _SEAL_ENC_KEY, bytearray(iv))
+    tag = hmac.new(_SEAL_MAC_KEY, dc_id.to_bytes(4, "big") + body, hashlib.sha256).digest()
+    return body + tag
+
+
+def open_auth_key(dc_id: int, sealed: bytes) -> Optional[bytes]:
+    """Decrypt a sealed auth key; None if it was tampered with or sealed under other secrets."""
+    if len(sealed) <= _SEAL_IV_LEN + _SEAL_TAG_LEN:
+        return None
+    body, tag = sealed[:-_SEAL_TAG_LEN], sealed[-_SEAL_TAG_LEN:]
+    expected = hmac.new(_SEAL_MAC_KEY, dc_id.to_bytes(4, "big") + body, hashlib.sha256).digest()
+    if not hmac.compare_digest(tag, expected):
+        return None
+    iv, ciphertext = body[:_SEAL_IV_LEN], body[_SEAL_IV_LEN:]
+    return aes.ctr256_decrypt(ciphertext, _SEAL_ENC_KEY, bytearray(iv))
+
+
+@dataclass
+class PooledSession:
+    """A started session parked in the pool, with its last release time."""
+    session: Session
+    last_used: float
+
+
 class SessionPool:
     def __init__(self, client):
         self.client = client
-        self.sessions: Dict[int, List[Session]] = defaultdict(list)
-        self.lock = asyncio.Lock()
+        self.sessions: Dict[int, Deque[PooledSession]] = defaultdict(deque)
+        # One lock per DC so pools for different DCs never contend
+        self.locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._reaper_task = None
+        # Per-DC auth keys for non-main DCs (sealed into db.auth_keys when
+        # Config.PERSIST_AUTH_KEYS is set)
+        self.auth_keys: Dict[int, bytes] = {}
+        # Cached storage values (async SQLite reads) - loaded once
+        self._main_dc_id = None
+        self._test_mode = None
+
+    async def _load_storage_info(self):
+        """Read main DC id and test mode from client storage once."""
+        if self._main_dc_id is None:
+            self._main_dc_id = await self.client.storage.dc_id()
+            self._test_mode = await self.client.storage.test_mode()
+
+    async def _load_auth_keys(self):
+        """Load persisted per-DC auth keys so restarts skip the DH handshake."""
+        if db.auth_keys is None:
+            return
+        try:
+            if not Config.PERSIST_AUTH_KEYS:
+                # Persistence is off - don't leave keys from earlier runs lying around
+                purged = await db.auth_keys.delete_many({})
+                if purged.deleted_count:
+                    logger.info("Purged %d persisted auth keys (PERSIST_AUTH_KEYS is off)", purged.deleted_count)
+                return
+            # Keys stored in plaintext by older versions are dropped, never loaded
+            await db.auth_keys.delete_many({"sealed": {"$exists": False}})
+            async for doc in db.auth_keys.find({}):
+                auth_key = open_auth_key(doc["_id"], doc["sealed"])
+                if auth_key is None:
+                    # Sealed under other BOT_TOKEN/API_HASH - a fresh handshake replaces it
+                    logger.warning("Ignoring undecryptable auth key for DC %s", doc["_id"])
+                    continue
+                self.auth_keys[doc["_id"]] = auth_key
+            if self.auth_keys:
+                logger.info(f"Loaded cached auth keys for DCs {sorted(self.auth_keys)}")
+        except Exception as e:
+            logger.error(f"Failed to load cached auth keys: {e}")
+
+    async def _new_auth_key(self, dc_id: int) -> bytes:
+        """Run the auth key handshake for a DC and persist the result."""
+        logger.info(f"Creating Auth Key for DC {dc_id}...")
+        auth_key = await Auth(self.client, dc_id, self._test_mode).create()
+        self.auth_keys[dc_id] = auth_key
+        if Config.PERSIST_AUTH_KEYS and db.auth_keys is not None:
+            try:
+                await db.auth_keys.replace_one(
+                    {"_id": dc_id}, {"sealed": seal_auth_key(dc_id, auth_key)}, upsert=True
+                )
+            except Exception as e:
+                logger.error(f"Failed to persist auth key for DC {dc_id}: {e}")
+        return auth_key
 
     async def init_pool(self):
         """Pre-initialize sessions for the main DC."""
         try:
-            dc_id = await self.client.storage.dc_id()
+            await self._load_storage_info()
+            await self._load_auth_keys()
+            dc_id = self._main_dc_id
             if not dc_id:
                 logger.warning("Cannot init pool: No DC ID found (not logged in?)")
                 return
             
             logger.info(f"Initializing session pool for Main DC {dc_id}...")
-            # Create 2 sessions for main DC
-            for i in range(2):
-                session = await self._create_and_start_session(dc_id)
-                self.sessions[dc_id].append(session)
-                logger.info(f"Pooled session {i+1}/2 ready for DC {dc_id}")
+            # Start one session per prefetch worker concurrently
+            results = await asyncio.gather(
+                *(self._create_and_start_session(dc_id) for _ in range(PREWARM_SESSIONS)),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    logger.error(f"Failed to pre-start session for DC {dc_id}: {result}")
+                else:
+                    self.sessions[dc_id].append(PooledSession(result, time.monotonic()))
+            logger.info(f"Pooled {len(self.sessions[dc_id])}/{PREWARM_SESSIONS} sessions ready for DC {dc_id}")
+
+            # One warm session for every other DC we've streamed from before
+            # (they have persisted auth keys), so the first seek there skips
+            # the connect + ImportAuthorization round-trips
+            other_dcs = [dc for dc in self.auth_keys if dc != dc_id]
+            results = await asyncio.gather(
+                *(self._create_and_start_session(dc) for dc in other_dcs),
+                return_exceptions=True,
+            )
+            for dc, result in zip(other_dcs, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"Could not pre-start session for DC {dc}: {result}")
+                else:
+                    self.sessions[dc].append(PooledSession(result, time.monotonic()))
+                    logger.info(f"Pooled session ready for DC {dc}")
+
+            # Background reaper for long-idle sessions
+            if self._reaper_task is None:
+                self._reaper_task = asyncio.create_task(self._reaper())
                 
         except Exception as e:
             logger.error(f"Failed to init pool: {e}")
 
     async def get_session(self, dc_id: int) -> Session:
-        async with self.lock:
-            while self.sessions[dc_id]:
-                session = self.sessions[dc_id].pop(0)
-                logger.info(f"♻️ Reusing pooled session for DC {dc_id}")
-                # Only return running sessions?
-                # Since we don't have a cheap check, we assume it works.
-                # If we implemented a health check, we would do it here.
-                return session
+        while True:
+            pooled = None
+            async with self.locks[dc_id]:
+                if self.sessions[dc_id]:
+                    pooled = self.sessions[dc_id].popleft()
+
+            if pooled is None:
+                break
+
+            # Sessions idle for a while may have been dropped by Telegram - ping first
+            if time.monotonic() - pooled.last_used > PING_AFTER_IDLE:
+                if not await self._is_alive(pooled.session):
+                    logger.info(f"Discarding dead pooled session for DC {dc_id}")
+                    await self._stop_quietly(pooled.session)
+                    continue
+
+            # Log outside the lock to keep the critical section O(1); %-style so
+            # records below the active level never get formatted (runs per get_file)
+            logger.debug("♻️ Reusing pooled session for DC %s", dc_id)
+            return pooled.session
 
         # If no session available, create one
-        logger.info(f"Pool empty/miss for DC {dc_id}, creating new session")
+        logger.info("Pool empty/miss for DC %s, creating new session", dc_id)
         return await self._create_and_start_session(dc_id)
 
     async def release_session(self, session: Session):
         if not session:
             return
 
-        async with self.lock:
+        async with self.locks[session.dc_id]:
             # Limit pool size per DC to avoid memory leaks if we connect to many DCs
-            # Keeping 3 sessions per DC seems reasonable for streaming
-            if len(self.sessions[session.dc_id]) < 3:
-                self.sessions[session.dc_id].append(session)
-                logger.debug(f"Session returned to pool for DC {session.dc_id}")
-            else:
-                logger.debug(f"Pool full for DC {session.dc_id}, stopping session")
-                await session.stop()
+            pooled = len(self.sessions[session.dc_id]) < MAX_POOLED_PER_DC
+            if pooled:
+                self.sessions[session.dc_id].append(PooledSession(session, time.monotonic()))
+
+        if pooled:
+            logger.debug("Session returned to pool for DC %s", session.dc_id)
+        else:
+            logger.debug("Pool full for DC %s, stopping session", session.dc_id)
+            await session.stop()
+
+    async def _is_alive(self, session: Session) -> bool:
+        """Cheap MTProto Ping round-trip to verify a pooled session still works."""
+        try:
+            await asyncio.wait_for(
+                session.invoke(raw.functions.Ping(ping_id=random.getrandbits(63))),
+                timeout=PING_TIMEOUT,
+            )
+            return True
+        except Exception as e:
+            logger.debug(f"Session health check failed for DC {session.dc_id}: {e}")
+            return False
+
+    async def _stop_quietly(self, session: Session):
+        try:
+            await session.stop()
+        except Exception as e:
+            logger.debug(f"Error stopping session for DC {session.dc_id}: {e}")
+
+    async def _reaper(self):
+        """Periodically stop pooled sessions that have been idle too long."""
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            now = time.monotonic()
+            stale = []
+            for dc_id in list(self.sessions):
+                async with self.locks[dc_id]:
+                    pool = self.sessions[dc_id]
+                    keep = deque(p for p in pool if now - p.last_used <= REAP_AFTER_IDLE)
+                    stale.extend(p.session for p in pool if now - p.last_used > REAP_AFTER_IDLE)
+                    self.sessions[dc_id] = keep
+
+            for session in stale:
+                await self._stop_quietly(session)
+            if stale:
+                logger.info(f"Reaped {len(stale)} idle pooled session(s)")
 
     async def _create_and_start_session(self, dc_id: int) -> Session:
-        is_main_dc = dc_id == await self.client.storage.dc_id()
+        await self._load_storage_info()
+        is_main_dc = dc_id == self._main_dc_id
         
         auth_key = None
+        cached_key = False
         if is_main_dc:
             auth_key = await self.client.storage.auth_key()
+        elif dc_id in self.auth_keys:
+            auth_key = self.auth_keys[dc_id]
+            cached_key = True
         else:
-             logger.info(f"Creating Auth Key for DC {dc_id}...")
-             auth_key = await Auth(self.client, dc_id, await self.client.storage.test_mode()).create()
+            auth_key = await self._new_auth_key(dc_id)
 
         session = Session(
             self.client,
             dc_id,
             auth_key,
-            await self.client.storage.test_mode(),
+            self._test_mode,
             is_media=True,
         )
 
-        await session.start()
+        try:
+            await session.start()
+        except Exception as e:
+            if not cached_key:
+                raise
+            # Persisted key was rejected (revoked/expired) - handshake a fresh one
+            logger.warning(f"Cached auth key for DC {dc_id} failed ({e}), creating a new one")
+            await self._stop_quietly(session)
+            auth_key = await self._new_auth_key(dc_id)
+            session = Session(
+                self.client,
+                dc_id,
+                auth_key,
+                self._test_mode,
+                is_media=True,
+            )
+            await session.start()
 
         if not is_main_dc:
             try:
@@ -44,9 +44,9 @@ class Config:
             value = os.getenv(key)
             if value is None:
                 return default
-            return int(value)  # Simple - handles negatives automatically
+            return int(value.strip())  # Handles negatives (channel IDs) automatically
         except (ValueError, TypeError):
-            print(f"⚠️ Invalid {key}: '{value}' - using default: {default}")
+            logger.warning(f"⚠️ Invalid {key}: '{value}' - using default: {default}")
             return default
 
     # Telegram Bot Configuration
@@ -64,13 +64,18 @@ class Config:
 
     # Telegram API Configuration
     TG_GETFILE_TIMEOUT = get_int_env("TG_GETFILE_TIMEOUT", 60)
+    MAX_CONCURRENT_TRANSMISSIONS = get_int_env("MAX_CONCURRENT_TRANSMISSIONS", 16)  # GetFile requests (and save_file uploads) in flight at once
+    # Persist per-DC auth keys in MongoDB (encrypted with a key derived from
+    # BOT_TOKEN + API_HASH) so restarts skip the DH handshake. Off by default:
+    # anyone holding both the database and those secrets can act as the bot
+    PERSIST_AUTH_KEYS = get_env("PERSIST_AUTH_KEYS", "false").lower() in ("1", "true", "yes")
+
+    # Streaming Configuration
+    STREAM_PREFETCH_WORKERS = get_int_env("STREAM_PREFETCH_WORKERS", 4)  # 1MB chunks fetched in parallel per stream
+    STREAM_MAX_CONCURRENT = get_int_env("STREAM_MAX_CONCURRENT", 20)  # Streams served at once; extra requests wait
 
     # Log Channel Indexing Configuration
     LOG_CHANNEL_ID = get_int_env("LOG_CHANNEL_ID", 0)
-    # DEBUG: Print LOG ID or ERROR
-   # import sys
-   # print(f"DEBUG: LOG_CHANNEL_ID from env = {LOG_CHANNEL_ID}", file=sys.stderr)
-   # print(f"DEBUG: Raw env var = {os.getenv('LOG_CHANNEL_ID', 'NOT FOUND')}", file=sys.stderr)
 
     MONGO_URL = get_env("MONGO_URL", "mongodb://localhost:27017")
     MONGO_DB_NAME = get_env("MONGO_DB_NAME", "streamvault")
@@ -79,6 +84,10 @@ class Config:
     MAX_FILE_SIZE_MB = get_int_env("MAX_FILE_SIZE_MB", 500)
     MAX_VIDEO_DURATION_HOURS = get_int_env("MAX_VIDEO_DURATION_HOURS", 2)
 
+    # YouTube Download Throttling (bytes/sec)
+    YT_RATELIMIT = get_int_env("YT_RATELIMIT", 5_000_000)  # Cap download speed (5 MB/s)
+    YT_THROTTLED_RATELIMIT = get_int_env("YT_THROTTLED_RATELIMIT", 100_000)  # Restart below 100 KB/s
+
     @classmethod
     def is_valid(cls):
         """
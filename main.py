@@ -1,7 +1,19 @@
 import asyncio
+import queue
 import uvicorn
 import logging
+import logging.handlers
+
+# libuv-backed event loop - must be installed before the Pyrogram client is
+# created, since it binds to the loop returned by get_event_loop()
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pyrogram import idle
 from config import Config
@@ -10,14 +22,20 @@ from server.stream_routes import stream_router
 from utils.database import db
 
 # Setup Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Handlers only enqueue records; a listener thread does the formatting and
+# stderr writes, so logging inside hot paths never blocks the event loop.
+log_queue = queue.Queue(-1)
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter(
+    "%(asctime)s %(levelname)s %(name)s %(message)s", datefmt="%H:%M:%S"
+))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_queue)])
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 # --- WEB SERVER SETUP ---
-web_app = FastAPI()
+web_app = FastAPI(default_response_class=ORJSONResponse)
 web_app.add_middleware(
     CORSMiddleware, allow_origins=["*"], allow_credentials=True, 
     allow_methods=["*"], allow_headers=["*"],
@@ -36,7 +54,8 @@ async def start_web_server():
         host=Config.HOST, 
         port=Config.PORT, 
         log_level="warning",
-        # NOTE: loop argument removed here to inherit the main loop
+        http="httptools",  # C HTTP parser instead of h11
+        # NOTE: loop argument removed here to inherit the main loop (uvloop if installed)
     )
     server = uvicorn.Server(config)
     await server.serve()
@@ -46,6 +65,10 @@ async def main():
     if not bot_app.is_enabled:
         return
 
+    # Pyrogram, the Mongo client and uvicorn all share this one loop
+    loop = asyncio.get_running_loop()
+    logger.info(f"--- 🔁 Event loop: {type(loop).__module__}.{type(loop).__name__} ---")
+
     # 0. Initialize Database Connection
     logger.info("--- 💾 Connecting to Database... ---")
     try:
@@ -114,4 +137,7 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         pass
     except Exception as e:
-        logger.error(f"Crash: {e}")
\ No newline at end of file
+        logger.error(f"Crash: {e}")
+    finally:
+        # Flush queued log records before exit
+        log_listener.stop()
\ No newline at end of file
@@ -2,31 +2,498 @@
 HTTP Streaming Routes for Shadow Streamer.
 
 Provides RESTful API endpoints for streaming Telegram files:
-- /stream/{chat_id}/{message_id} - Stream file with HTTP 206 support
+- /stream/{chat_id}/{message_id} - Stream file with HTTP 206 support (200 for full-file requests)
 - Handles byte-range requests for seeking
 - Auto-heals expired file references
 - Implements exponential backoff for timeouts
+- Prefetches 1MB chunks in parallel over pooled sessions
 - Supports all media types (video, audio, documents)
+
+Invariant: handlers are `async def` and every sync helper they call inline
+(parse_range, MediaMeta.from_media, the _EXT_MIME lookup) is pure CPU work
+with no file or network I/O, so nothing here can stall the event loop.
+mimetypes is initialized at import for the same reason.
+Anything that may touch disk or the network must be awaited or offloaded.
 """
 
-import mimetypes
 import logging
 import asyncio
+import mimetypes
+import random
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import AsyncGenerator, Awaitable, Callable, List, Mapping, Optional, Tuple
 from urllib.parse import quote  # Encodes Filenames (Fixes Emoji Crash)
 
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import APIRouter, Request
+from fastapi.responses import Response, JSONResponse
+from cachetools import TTLCache
 
 from bot.client import bot_app
 from config import Config
 from utils.range_parser import parse_range
 from pyrogram.errors import OffsetInvalid, FileReferenceExpired
+from pyrogram.file_id import FileId
 
 logger = logging.getLogger("stream_routes")
 stream_router = APIRouter()
 
+# Read the system mime.types now, not lazily inside the first request
+mimetypes.init()
+
+# Telegram chunks are exactly 1,048,576 bytes
+CHUNK_SHIFT = 20
+CHUNK_SIZE = 1 << CHUNK_SHIFT
+
+# Chunks fetched per get_file call (back-to-back GetFile requests)
+STREAM_BATCH_CHUNKS = 8
+# Chunks a prefetching segment may buffer ahead of the client
+SEGMENT_BUFFER = 2
+# Timeout/socket-error retries per segment before the stream is aborted
+SEGMENT_MAX_RETRIES = 5
+# Max seconds the client waits on a single chunk before the stream is aborted
+CHUNK_STALL_TIMEOUT = 180
+# Assumed file_reference lifetime; long streams refresh the message ahead of it
+FILE_REF_TTL = 3600
+FILE_REF_REFRESH_MARGIN = 60
+# How long a message's MediaMeta is reused across requests. Well inside
+# FILE_REF_TTL, and a reference that expires anyway is healed by refresh_meta.
+META_CACHE_TTL = 1800
+
+# Adjacent body pieces are merged into one ASGI send while they fit in this
+SEND_COALESCE_BYTES = 64 * 1024
+
+# Max seconds a request waits for the bot to finish connecting
+READY_TIMEOUT = 10
+# Max seconds a request waits for a free stream slot before getting 503
+ADMISSION_TIMEOUT = 30
+
+
+class StreamAdmission:
+    """
+    Counter + Condition admission control for concurrent streams.
+    
+    Requests over the cap wait for a slot instead of all piling onto the
+    Telegram sessions at once. Lowering max_active via set_limit() never
+    cancels running streams; new arrivals simply wait until active drops.
+    """
+
+    def __init__(self, max_active: int):
+        self.active = 0
+        self.max_active = max_active
+        self._cv = asyncio.Condition()
+
+    async def acquire(self, timeout: float) -> bool:
+        """Take a slot, waiting up to timeout seconds. Returns False on timeout."""
+        async with self._cv:
+            try:
+                await asyncio.wait_for(
+                    self._cv.wait_for(lambda: self.active < self.max_active), timeout
+                )
+            except asyncio.TimeoutError:
+                return False
+            self.active += 1
+            return True
+
+    async def release(self):
+        """Return a slot and wake one waiter."""
+        async with self._cv:
+            self.active -= 1
+            self._cv.notify(1)
+
+    async def set_limit(self, max_active: int):
+        """Change the cap at runtime (waiters re-check immediately)."""
+        async with self._cv:
+            self.max_active = max_active
+            self._cv.notify_all()
+
+
+stream_admission = StreamAdmission(Config.STREAM_MAX_CONCURRENT)
+
+class RawStreamResponse(Response):
+    """
+    Streaming response that writes ASGI body frames directly.
+    
+    Skips StreamingResponse's per-chunk wrapper and anyio task group: one
+    http.response.start, one http.response.body per chunk, and a watcher on
+    `receive` so a client disconnect cancels the upstream fetch. `release`
+    always runs once the response ends, even if the body never started.
+    
+    Small adjacent pieces (range edges) are merged up to SEND_COALESCE_BYTES,
+    and the last piece is sent with more_body=False instead of trailing an
+    empty frame, saving a transport write per response.
+    
+    The declared Content-Length is always sent (no chunked framing). If the
+    body iterator stops short of it (upstream failure), the response is
+    left unfinished so the server drops the connection - the client then
+    sees a truncated transfer and re-requests the rest with a Range.
+    """
+
+    def __init__(self, body_iterator: AsyncGenerator[bytes, None], status_code: int,
+                 raw_headers: List[Tuple[bytes, bytes]], content_length: Optional[int],
+                 release: Callable[[], Awaitable[None]]):
+        # raw_headers are already-encoded (lowercase name, value) pairs and
+        # must include content-length when content_length is given
+        self.body_iterator = body_iterator
+        self.status_code = status_code
+        self.raw_headers = raw_headers
+        self.content_length = content_length
+        self.release = release
+        self.background = None
+
+    async def _send_body(self, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        # One piece is held back so the final frame can carry more_body=False
+        held = None
+        sent = 0
+        try:
+            async for chunk in self.body_iterator:
+                sent += len(chunk)
+                if held is not None:
+                    if len(held) + len(chunk) <= SEND_COALESCE_BYTES:
+                        if not isinstance(held, bytearray):
+                            held = bytearray(held)
+                        held += chunk
+                        continue
+                    await send({"type": "http.response.body", "body": held, "more_body": True})
+                held = chunk
+        finally:
+            # Close the generator here (send error / cancel) so its cleanup runs now, not at GC
+            await self.body_iterator.aclose()
+        if self.content_length is not None and sent < self.content_length:
+            logger.warning(f"Stream ended at {sent}/{self.content_length} bytes - dropping connection")
+            if held is not None:
+                await send({"type": "http.response.body", "body": held, "more_body": True})
+            return
+        await send({"type": "http.response.body", "body": held if held is not None else b"", "more_body": False})
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def __call__(self, scope, receive, send):
+        sender = asyncio.create_task(self._send_body(send))
+        watcher = asyncio.create_task(self._wait_disconnect(receive))
+        try:
+            await asyncio.wait({sender, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Disconnect (or error) - cancelling the sender closes the generator
+            sender.cancel()
+            watcher.cancel()
+            await asyncio.gather(sender, watcher, return_exceptions=True)
+            await self.release()
+        if sender.done() and not sender.cancelled() and sender.exception() is not None:
+            raise sender.exception()
+        if self.background is not None:
+            await self.background()
+
+
+# Extension -> Content-Type overrides (Telegram often sends 'application/octet-stream').
+# Video containers are deliberately served as video/mp4 so browsers PLAY instead of DOWNLOAD.
+_EXT_MIME = MappingProxyType({
+    "mp4": "video/mp4", "mkv": "video/mp4", "webm": "video/mp4", "mov": "video/mp4", "avi": "video/mp4",
+    "mp3": "audio/mpeg", "m4a": "audio/mp4", "flac": "audio/flac",
+    "aac": "audio/aac", "ogg": "audio/ogg", "opus": "audio/ogg", "wav": "audio/wav",
+})
+
+
+@dataclass(frozen=True)
+class MediaMeta:
+    """
+    Streaming metadata extracted from a LOG_CHANNEL message.
+    
+    Everything that doesn't depend on the requested range (quoted file
+    name, content type, static headers) is computed once per file here;
+    requests only add Content-Length / Content-Range. The static headers are
+    also kept ASGI-encoded (raw_headers) so responses never re-serialize
+    them. The file_id string is decoded once, so segments hand it straight
+    to ShadowBot.get_file.
+    """
+    file_id: FileId
+    file_size: int
+    file_name: str
+    content_type: str
+    headers: Mapping[str, str]
+    raw_headers: Tuple[Tuple[bytes, bytes], ...]
+    fetched_at: float = field(default_factory=time.monotonic)  # When file_id was obtained
+
+    @classmethod
+    def from_message(cls, message) -> Optional["MediaMeta"]:
+        """Build metadata from a message's video/audio/document, or None if it has none."""
+        # We verify Video first, then Audio, then Document
+        media = message.video or message.audio or message.document
+        return cls.from_media(media) if media else None
+
+    @classmethod
+    def from_media(cls, media) -> "MediaMeta":
+        # Name Logic: Video/Audio/Document always expose file_name (may be None)
+        raw_name = media.file_name or "video.mp4"
+        
+        # [CRITICAL FIX] Sanitize Filename for HTTP Headers
+        # Uses urllib.quote to turn "🕶" into "%F0..." preventing Internal Server Error
+        safe_name = quote(raw_name)
+
+        # Content-Type (MIME) Logic
+        # Telegram often marks MKV/MP4 files in 'Documents' as 'application/octet-stream'
+        # We manually force 'video/mp4' for known extensions so Browsers PLAY instead of DOWNLOAD.
+        content_type = _EXT_MIME.get(raw_name.rpartition('.')[2].lower())
+        if content_type is None:
+            content_type = media.mime_type
+            if not content_type or content_type == "application/octet-stream":
+                # Long tail: let the system table name it before giving up
+                content_type = mimetypes.guess_type(raw_name)[0] or "application/octet-stream"
+
+        headers = MappingProxyType({
+            # Advertise range support so players can still seek after a 200
+            "Accept-Ranges": "bytes",
+            "Content-Type": content_type,
+            
+            # [FIX] 'inline' = Play in Browser. 'filename' = URL-Encoded safe name.
+            "Content-Disposition": f'inline; filename="{safe_name}"',
+            
+            # Player Hints
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive"
+        })
+        raw_headers = tuple((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items())
+        return cls(FileId.decode(media.file_id), media.file_size, raw_name, content_type, headers, raw_headers)
+
+
+# Players fire many range requests per file - skip get_messages() for repeats.
+# Covers a whole viewing session, so seeks never wait on a Telegram RPC.
+_meta_cache = TTLCache(maxsize=1024, ttl=META_CACHE_TTL)
+# Per-key locks so a burst of cold requests makes a single get_messages() call
+_meta_locks: "weakref.WeakValueDictionary[tuple, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+async def get_meta_cached(chat_id: int, message_id: int) -> Optional[MediaMeta]:
+    """
+    Read-through cache around get_messages() + media extraction.
+    
+    Args:
+        chat_id (int): Telegram chat ID (log channel)
+        message_id (int): Telegram message ID in log channel
+        
+    Returns:
+        MediaMeta: File metadata, or None if the message is gone or has no media
+    """
+    key = (chat_id, message_id)
+    meta = _meta_cache.get(key)
+    if meta is not None:
+        return meta
+
+    lock = _meta_locks.get(key)
+    if lock is None:
+        lock = _meta_locks[key] = asyncio.Lock()
+
+    async with lock:
+        # Another request may have filled it while we waited
+        meta = _meta_cache.get(key)
+        if meta is not None:
+            return meta
+
+        message = await bot_app.get_messages(chat_id, message_id)
+        if not message or message.empty:
+            return None
+
+        meta = MediaMeta.from_message(message)
+        if meta is not None:
+            _meta_cache[key] = meta
+        return meta
+
+
+async def refresh_meta(chat_id: int, message_id: int) -> Optional[MediaMeta]:
+    """Drop the cached entry and re-fetch the message (fresh file_reference)."""
+    _meta_cache.pop((chat_id, message_id), None)
+    return await get_meta_cached(chat_id, message_id)
+
 
-@stream_router.get("/stream/{chat_id}/{message_id}")
+async def fetch_segment(chat_id: int, message_id: int, file_id: FileId, index: int, count: int, out: asyncio.Queue):
+    """
+    Download `count` consecutive 1MB chunks into a queue.
+    
+    One ShadowBot.get_file iteration covers the whole segment (up to
+    STREAM_BATCH_CHUNKS upload.GetFile calls). Several segments run in
+    parallel; across all streams, GetFile requests in flight - and the
+    pooled sessions serving them - are capped by MAX_CONCURRENT_TRANSMISSIONS
+    inside get_file (a permit and a session per request, neither held while
+    this segment waits on `out`).
+    
+    The iterator is driven with __anext__ so a failure is caught around the
+    one pending request. An async generator can't be resumed once it raised,
+    so recovery rebuilds it from the first chunk not yet delivered (never
+    from the segment start):
+    - Timeouts / socket errors: exponential backoff, up to SEGMENT_MAX_RETRIES
+    - FileReferenceExpired / OffsetInvalid: re-fetch the message once for a fresh file_id
+    
+    Args:
+        chat_id (int): Telegram chat ID (log channel)
+        message_id (int): Telegram message ID in log channel
+        file_id (FileId): Decoded Pyrogram file ID
+        index (int): First chunk index (offset in 1MB chunks)
+        count (int): Number of chunks to fetch
+        out (asyncio.Queue): Receives each chunk, then None when the segment
+            ends (or the exception that stopped it)
+    """
+    fetched = 0
+    timeout_failures = 0
+    refreshed = False
+    try:
+        while fetched < count:
+            # Straight to the pooled get_file - stream_media would re-decode the
+            # file_id and re-yield every chunk through one more generator frame
+            it = bot_app.get_file(file_id, offset=index + fetched, limit=count - fetched).__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await it.__anext__()
+                    except StopAsyncIteration:
+                        fetched = count  # Segment (or file) finished
+                        break
+                    await out.put(chunk)
+                    fetched += 1
+                    timeout_failures = 0
+            except (asyncio.TimeoutError, OSError) as e:
+                timeout_failures += 1
+                if timeout_failures > SEGMENT_MAX_RETRIES:
+                    raise
+                # Jittered so streams hit by the same DC outage don't retry in lockstep
+                backoff = min(2 ** (timeout_failures - 1), 30)
+                backoff = min(random.uniform(backoff * 0.5, backoff * 1.5), 30)
+                logger.warning(f"Chunk {index + fetched} fetch failed ({e!r}), retry {timeout_failures} in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+            except (FileReferenceExpired, OffsetInvalid):
+                if refreshed:
+                    raise
+                refreshed = True
+                # Evict the stale file_id and re-fetch the message for a fresh reference
+                meta = await refresh_meta(chat_id, message_id)
+                if meta is None:
+                    raise
+                file_id = meta.file_id
+                logger.info(f"Refreshed file reference for {chat_id}/{message_id}")
+            finally:
+                # Finalize the generator now, not when the GC gets to it
+                # (matters when we're cancelled while blocked on out.put)
+                await it.aclose()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await out.put(e)
+        return
+    await out.put(None)
+
+
+async def next_chunk(queue: asyncio.Queue):
+    """
+    Take the next item from a segment queue, waiting at most CHUNK_STALL_TIMEOUT.
+    
+    Prefetching usually keeps the queue non-empty, so the common case is a
+    get_nowait() - wait_for() (which wraps the get in a new Task on 3.10)
+    only runs when the client has caught up with the download.
+    """
+    try:
+        return queue.get_nowait()
+    except asyncio.QueueEmpty:
+        return await asyncio.wait_for(queue.get(), CHUNK_STALL_TIMEOUT)
+
+
+async def media_stream_generator(chat_id: int, message_id: int, meta: MediaMeta,
+                                 start: int, end: int, release: Callable[[], Awaitable[None]]):
+    """
+    Yield bytes start..end (inclusive) of a Telegram file.
+    
+    Shared fast path for every stream request: prefetches segments in
+    parallel, trims the edge chunks and refreshes the file reference on
+    long streams.
+    
+    Args:
+        chat_id (int): Telegram chat ID (log channel)
+        message_id (int): Telegram message ID in log channel
+        meta (MediaMeta): Cached file metadata
+        start (int): First byte offset
+        end (int): Last byte offset (inclusive)
+        release (Callable): Releases the admission slot when streaming stops
+    """
+    # Convert HTTP byte offsets -> Telegram 1MB chunk offsets
+    first_chunk = start >> CHUNK_SHIFT
+    last_chunk = end >> CHUNK_SHIFT
+    next_index = first_chunk
+    # Byte offset of the next chunk handed to the client, advanced per chunk
+    chunk_start = first_chunk << CHUNK_SHIFT
+    # Sliding window of in-flight segments, kept in chunk order
+    pending = deque()
+    # Long streams refresh the file reference in the background before it expires
+    current_meta = meta
+    refresh_task = None
+    try:
+        while next_index <= last_chunk or pending:
+            if refresh_task is None:
+                if time.monotonic() - current_meta.fetched_at > FILE_REF_TTL - FILE_REF_REFRESH_MARGIN:
+                    refresh_task = asyncio.create_task(refresh_meta(chat_id, message_id))
+            elif refresh_task.done():
+                # Swap in the fresh file_id for segments started from now on
+                if not refresh_task.cancelled() and refresh_task.exception() is None and refresh_task.result():
+                    current_meta = refresh_task.result()
+                refresh_task = None
+
+            # Keep STREAM_PREFETCH_WORKERS segments downloading ahead of the client
+            while next_index <= last_chunk and len(pending) < Config.STREAM_PREFETCH_WORKERS:
+                count = min(STREAM_BATCH_CHUNKS, last_chunk - next_index + 1)
+                queue = asyncio.Queue(maxsize=SEGMENT_BUFFER)
+                task = asyncio.create_task(
+                    fetch_segment(chat_id, message_id, current_meta.file_id, next_index, count, queue)
+                )
+                pending.append((next_index, queue, task))
+                next_index += count
+
+            # Drain the oldest segment as its chunks arrive
+            _, queue, _ = pending[0]
+            eof = False
+            while (chunk := await next_chunk(queue)) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                # Trim to the requested byte range (first/last chunk rarely align to 1MB)
+                lo = max(start - chunk_start, 0)
+                hi = min(end - chunk_start + 1, len(chunk))
+                if lo == 0 and hi == len(chunk):
+                    yield chunk
+                else:
+                    # Zero-copy slice - uvicorn writes memoryview bodies as-is
+                    yield memoryview(chunk)[lo:hi]
+
+                chunk_start += CHUNK_SIZE
+                if len(chunk) < CHUNK_SIZE:
+                    eof = True
+                    break
+            pending.popleft()
+            if eof:
+                break
+
+    except asyncio.TimeoutError:
+        logger.error(f"Stream stalled: no chunk for {CHUNK_STALL_TIMEOUT}s ({chat_id}/{message_id}) - aborting")
+    except FileReferenceExpired:
+        # Safety net - segments already retried once with a refreshed message
+        logger.warning("Telegram File Reference Expired after refresh - aborting stream.")
+        # Drop the cached file_id so the next request re-fetches the message
+        _meta_cache.pop((chat_id, message_id), None)
+    except Exception as e:
+        logger.error(f"Streaming Chunk Error: {e}")
+    finally:
+        # Client disconnected or range done - stop prefetches still in flight
+        for _, _, task in pending:
+            task.cancel()
+        if refresh_task is not None:
+            refresh_task.cancel()
+        await release()
+
+
+@stream_router.api_route("/stream/{chat_id}/{message_id}", methods=["GET", "HEAD"])
 async def stream_handler(request: Request, chat_id: int, message_id: int):
     """
     Stream a file from Telegram as an HTTP response.
@@ -36,136 +503,105 @@ async def stream_handler(request: Request, chat_id: int, message_id: int):
     - Resuming interrupted downloads
     - Playing in browser without downloading entire file
     
+    HEAD requests get the same status and headers with no body.
+    
     Args:
         request (Request): FastAPI request object
         chat_id (int): Telegram chat ID (log channel)
         message_id (int): Telegram message ID in log channel
         
     Returns:
-        StreamingResponse: Streamed file data with proper headers
+        RawStreamResponse: Streamed file data with proper headers
+        Response: Headers only, for HEAD requests
         JSONResponse: Error response if bot disconnected or file not found
     """
     
-    # 1. Connectivity Check
-    if not bot_app.is_connected:
+    # 1. Connectivity Check (waits on the shared readiness gate during startup)
+    if not await bot_app.wait_until_ready(READY_TIMEOUT):
         return JSONResponse(
             status_code=503, 
             content={"error": "Bot is still starting up. Please wait."}
         )
 
     try:
-        # 2. Fetch the Message from Telegram
-        message = await bot_app.get_messages(chat_id, message_id)
+        # 2-3. Fetch the Message + extract Media (cached per chat/message)
+        meta = await get_meta_cached(chat_id, message_id)
         
-        if not message or message.empty:
-            return JSONResponse(
-                status_code=404, 
-                content={"error": "Message not found. It might have been deleted."}
-            )
-        
-        # 3. Extract Media (Critical: Must happen before using 'media' variable)
-        # We verify Video first, then Audio, then Document
-        media = message.video or message.audio or message.document
-        
-        if not media:
+        if meta is None:
             return JSONResponse(
                 status_code=404, 
-                content={"error": "No media found inside this message."}
+                content={"error": "Message not found or has no media. It might have been deleted."}
             )
 
-        # 4. Extract File Metadata
-        file_id = media.file_id
-        file_size = media.file_size
-        
-        # Name Logic: Get name safely, handle missing attributes
-        raw_name = getattr(media, "file_name", "streamed_file.mp4") or "video.mp4"
-        
-        # [CRITICAL FIX] Sanitize Filename for HTTP Headers
-        # Uses urllib.quote to turn "🕶" into "%F0..." preventing Internal Server Error
-        safe_name = quote(raw_name)
-
-        # 5. Content-Type (MIME) Logic
-        # Telegram often marks MKV/MP4 files in 'Documents' as 'application/octet-stream'
-        # We manually force 'video/mp4' for known extensions so Browsers PLAY instead of DOWNLOAD.
-        content_type = getattr(media, "mime_type", "application/octet-stream")
-        if raw_name.lower().endswith(('.mp4', '.mkv', '.webm', '.mov', '.avi')):
-             content_type = "video/mp4"
+        # 4-5. File Metadata + Content-Type (precomputed once per file)
+        file_size = meta.file_size
 
         # 6. Parse Range Header (Handling Scrubbing/Seeking)
-        range_header = request.headers.get("Range")
+        # Straight from the raw ASGI header list - skips building request.headers
+        range_header = None
+        for name, value in request.scope["headers"]:
+            if name == b"range":
+                range_header = value
+                break
         
         # [CRITICAL FIX] Handle Missing or Invalid Range Headers (The crash fixer)
         # If the browser requests the full file (no Range header), we start from 0.
-        if range_header:
-            parsed_result = parse_range(range_header, file_size)
-            if parsed_result:
-                start, end = parsed_result
-            else:
-                # If parse fails, default to full file
-                start, end = 0, file_size - 1
+        parsed_result = parse_range(range_header, file_size) if range_header else None
+        # Only a satisfiable Range gets 206; a missing or unparsable one is ignored (RFC 7233)
+        is_partial = parsed_result is not None
+        if is_partial:
+            start, end = parsed_result
         else:
-            # If no header provided, stream from beginning
+            # No (valid) header provided, stream the full file from the beginning
             start, end = 0, file_size - 1
         
-        # Verify valid range logic (Just in case)
-        if start >= file_size or end >= file_size:
-            return JSONResponse(status_code=416, content={"error": "Range Not Satisfiable"})
+        # Well-formed but unsatisfiable range (starts past EOF) -> 416 (RFC 7233 §4.4)
+        if is_partial and start >= file_size:
+            return JSONResponse(
+                status_code=416,
+                content={"error": "Range Not Satisfiable"},
+                headers={"Content-Range": f"bytes */{file_size}"}
+            )
 
         chunk_size = end - start + 1
-        
-        # 7. Async Generator to Stream Data
-        async def chunk_generator():
-            try:
-                # Convert HTTP byte offsets -> Telegram 1MB chunk offsets
-                # Telegram chunks are exactly 1,048,576 bytes
-                chunk_index = start // (1024 * 1024)
-                first_chunk_skip = start % (1024 * 1024)
-                current_pos = start
-                
-                # Use Pyrogram's stream_media iterator
-                async for chunk in bot_app.stream_media(file_id, offset=chunk_index):
-                    # Trim the start of the first chunk if request didn't align perfectly with 1MB
-                    if first_chunk_skip > 0:
-                        chunk = chunk[first_chunk_skip:]
-                        first_chunk_skip = 0
-                    
-                    # Stop if we have sent enough data
-                    if current_pos + len(chunk) > end:
-                        yield chunk[:end - current_pos + 1]
-                        break
-                    
-                    yield chunk
-                    current_pos += len(chunk)
-                    
-            except FileReferenceExpired:
-                logger.warning("Telegram File Reference Expired - Needs Refresh logic.")
-                # Note: Pyrogram usually auto-refreshes internally for download calls
-            except Exception as e:
-                logger.error(f"Streaming Chunk Error: {e}")
-
-        # 8. Build Response Headers
-        headers = {
+        # 206 Partial Content for range requests, 200 OK for full-file requests
+        status_code = 206 if is_partial else 200
+
+        # 7. Build Response Headers (static part cached pre-encoded, only range fields per request)
+        raw_headers = [*meta.raw_headers, (b"content-length", str(chunk_size).encode())]
+        if is_partial:
             # Required for Range Requests
-            "Content-Range": f"bytes {start}-{end}/{file_size}",
-            "Accept-Ranges": "bytes",
-            "Content-Length": str(chunk_size),
-            "Content-Type": content_type,
-            
-            # [FIX] 'inline' = Play in Browser. 'filename' = URL-Encoded safe name.
-            "Content-Disposition": f'inline; filename="{safe_name}"',
-            
-            # Player Hints
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive"
-        }
-
-        # 9. Return 206 Partial Content Response
-        # We use 206 even for full file because it's safer for seeking behavior in players
-        return StreamingResponse(
-            chunk_generator(),
-            status_code=206,
-            headers=headers,
-            media_type=content_type
+            raw_headers.append((b"content-range", f"bytes {start}-{end}/{file_size}".encode()))
+
+        # 8. HEAD probes (players learning size / range support) get the headers
+        # alone - answered from cached metadata, no stream slot or generator
+        if request.method == "HEAD":
+            response = Response(status_code=status_code)
+            response.raw_headers = raw_headers
+            return response
+
+        # 9. Admission Control (slot held until the generator finishes)
+        if not await stream_admission.acquire(ADMISSION_TIMEOUT):
+            return JSONResponse(
+                status_code=503,
+                content={"error": "Server busy. Please retry shortly."}
+            )
+
+        slot_released = False
+        async def release_slot():
+            # Idempotent: runs from the generator's finally and the response's own cleanup
+            nonlocal slot_released
+            if not slot_released:
+                slot_released = True
+                await stream_admission.release()
+
+        # 10. Stream the body
+        return RawStreamResponse(
+            media_stream_generator(chat_id, message_id, meta, start, end, release_slot),
+            status_code=status_code,
+            raw_headers=raw_headers,
+            content_length=chunk_size,
+            release=release_slot
         )
 
     except Exception as e:
@@ -0,0 +1,38 @@
+"""
+Tests for utils/range_parser.py.
+
+parse_range is fed both decoded strings and the raw bytes values the
+stream handler reads straight from the ASGI scope.
+"""
+
+import pytest
+
+from utils.range_parser import parse_range
+
+FILE_SIZE = 10_000
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("bytes=0-1023", (0, 1023)),
+    ("bytes=5000-", (5000, FILE_SIZE - 1)),     # open-ended
+    ("bytes=9000-20000", (9000, FILE_SIZE - 1)),  # end clamped to EOF
+    ("bytes=20000-", (20000, FILE_SIZE - 1)),   # unsatisfiable, caller answers 416
+])
+def test_valid_range(header, expected):
+    assert parse_range(header, FILE_SIZE) == expected
+    assert parse_range(header.encode(), FILE_SIZE) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "",
+    "invalid",
+    "bytes=-1024",        # suffix range (not supported)
+    "bytes=abc-def",
+    "bytes=100-50",       # last < first
+    "bytes=0-10,20-30",   # multi-range
+    "items=0-10",
+    " bytes=0-10",
+])
+def test_malformed_range(header):
+    assert parse_range(header, FILE_SIZE) is None
+    assert parse_range(header.encode(), FILE_SIZE) is None
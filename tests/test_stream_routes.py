@@ -0,0 +1,163 @@
+"""
+Tests for the stream generator and response in server/stream_routes.py.
+
+Telegram is replaced by a fake bot_app.get_file serving a deterministic
+byte pattern, so full and partial ranges can be checked byte-for-byte.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pyrogram")
+pytest.importorskip("cachetools")
+
+from server import stream_routes  # noqa: E402
+from server.stream_routes import (  # noqa: E402
+    CHUNK_SIZE,
+    STREAM_BATCH_CHUNKS,
+    MediaMeta,
+    RawStreamResponse,
+    media_stream_generator,
+    stream_handler,
+)
+
+# 20.5 chunks: three prefetch segments, and the last Telegram chunk is short
+FILE_CHUNKS = 21
+FILE_SIZE = (FILE_CHUNKS - 1) * CHUNK_SIZE + CHUNK_SIZE // 2
+FILE_BYTES = (bytes(range(251)) * (FILE_SIZE // 251 + 1))[:FILE_SIZE]
+
+
+async def fake_get_file(file_id, file_size=0, limit=0, offset=0, **kwargs):
+    """Yield 1MB chunks from FILE_BYTES like ShadowBot.get_file (offset/limit in chunks)."""
+    index = offset
+    while limit <= 0 or index < offset + limit:
+        chunk = FILE_BYTES[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+        if not chunk:
+            return
+        # Earlier chunks arrive later, so segments complete out of order
+        await asyncio.sleep(0.001 * (FILE_CHUNKS - index))
+        yield chunk
+        if len(chunk) < CHUNK_SIZE:
+            return
+        index += 1
+
+
+def make_meta() -> MediaMeta:
+    return MediaMeta(
+        file_id=None,
+        file_size=FILE_SIZE,
+        file_name="test.mp4",
+        content_type="video/mp4",
+        headers={},
+        raw_headers=(),
+    )
+
+
+async def collect(start: int, end: int) -> bytes:
+    released = []
+
+    async def release():
+        released.append(True)
+
+    parts = []
+    async for piece in media_stream_generator(1, 2, make_meta(), start, end, release):
+        parts.append(bytes(piece))
+    assert released, "admission slot was not released"
+    return b"".join(parts)
+
+
+@pytest.fixture(autouse=True)
+def patch_get_file(monkeypatch):
+    monkeypatch.setattr(stream_routes.bot_app, "get_file", fake_get_file)
+
+
+def test_full_range():
+    body = asyncio.run(collect(0, FILE_SIZE - 1))
+    assert body == FILE_BYTES
+
+
+@pytest.mark.parametrize("start,end", [
+    (0, 0),
+    (100, 2 * CHUNK_SIZE + 5),             # spans chunk boundaries
+    (CHUNK_SIZE, 2 * CHUNK_SIZE - 1),      # exactly one aligned chunk
+    (FILE_SIZE - CHUNK_SIZE // 2 + 10, FILE_SIZE - 1),  # inside the short last chunk
+])
+def test_partial_range(start, end):
+    body = asyncio.run(collect(start, end))
+    assert body == FILE_BYTES[start:end + 1]
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+@pytest.mark.parametrize("start,end", [
+    (STREAM_BATCH_CHUNKS * CHUNK_SIZE - 7, STREAM_BATCH_CHUNKS * CHUNK_SIZE + 6),  # straddles a segment edge
+    (CHUNK_SIZE + 3, 2 * STREAM_BATCH_CHUNKS * CHUNK_SIZE + 99),  # spans all three segments
+])
+def test_range_across_segments(monkeypatch, workers, start, end):
+    # Fewer workers than segments -> the prefetch window has to slide
+    monkeypatch.setattr(stream_routes.Config, "STREAM_PREFETCH_WORKERS", workers)
+    body = asyncio.run(collect(start, end))
+    assert body == FILE_BYTES[start:end + 1]
+
+
+class FakeRequest:
+    def __init__(self, range_header: bytes):
+        self.method = "GET"
+        self.scope = {"headers": [(b"range", range_header)]}
+
+
+def test_range_past_eof_is_416(monkeypatch):
+    async def ready(timeout):
+        return True
+
+    async def meta(chat_id, message_id):
+        return make_meta()
+
+    monkeypatch.setattr(stream_routes.bot_app, "wait_until_ready", ready)
+    monkeypatch.setattr(stream_routes, "get_meta_cached", meta)
+    request = FakeRequest(b"bytes=%d-" % FILE_SIZE)
+    response = asyncio.run(stream_handler(request, 1, 2))
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{FILE_SIZE}"
+
+
+async def run_response(pieces, content_length):
+    """Drive a RawStreamResponse over a fake ASGI transport; return the sent messages."""
+    sent = []
+    released = []
+
+    async def body():
+        for piece in pieces:
+            yield piece
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        await asyncio.Event().wait()  # Client never disconnects
+
+    async def release():
+        released.append(True)
+
+    response = RawStreamResponse(
+        body(), 200, [(b"content-length", str(content_length).encode())], content_length, release
+    )
+    await response({"type": "http"}, receive, send)
+    assert released, "admission slot was not released"
+    return sent
+
+
+def test_response_complete_body():
+    sent = asyncio.run(run_response([b"a" * 10, b"b" * 10], 20))
+    assert sent[0]["type"] == "http.response.start"
+    assert b"".join(m["body"] for m in sent[1:]) == b"a" * 10 + b"b" * 10
+    assert sent[-1]["more_body"] is False
+
+
+def test_response_short_body_drops_connection():
+    # Upstream stopped short of Content-Length: every frame says more_body,
+    # so the server never completes the response and drops the connection
+    sent = asyncio.run(run_response([b"a" * 10], 20))
+    assert b"".join(m["body"] for m in sent[1:]) == b"a" * 10
+    assert all(m["more_body"] for m in sent[1:])
@@ -8,16 +8,73 @@ Handles all database operations including:
 - Soft delete support
 """
 
+import asyncio
 import logging
+import re
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Optional, Dict, Any, List, Tuple
 from bson.objectid import ObjectId
+from cachetools import TTLCache
+from pymongo import AsyncMongoClient, InsertOne, UpdateOne, WriteConcern
+from pymongo.errors import BulkWriteError
 
 from config import Config
 
 logger = logging.getLogger("database")
 
+# Bulk writer tuning for queued inserts
+SAVE_BATCH_SIZE = 100     # Max documents per bulk_write
+SAVE_BATCH_WINDOW = 1.0   # Max seconds to wait for a batch to fill
+
+# Only the fields list replies (/search, /catalog) render
+SEARCH_PROJECTION = {"custom_name": 1, "file_size": 1, "file_type": 1, "message_id": 1, "_id": 0}
+# get_file fields - all in the file lookup index, so the query never touches documents
+FILE_LOOKUP_INDEX = [("message_id", 1), ("is_active", 1), ("custom_name", 1), ("file_size", 1)]
+FILE_LOOKUP_PROJECTION = {"message_id": 1, "custom_name": 1, "file_size": 1, "_id": 0}
+# Generic listing fields - message_id is the stable key, so _id is never sent
+CATALOG_PROJECTION = {**SEARCH_PROJECTION, "created_at": 1, "source": 1}
+# Paged catalog rows also carry _id - the keyset tiebreaker for equal created_at
+CATALOG_PAGE_PROJECTION = {**CATALOG_PROJECTION, "_id": 1}
+# Newest first; _id makes the order total so skip and keyset pages agree
+CATALOG_SORT = [("created_at", -1), ("_id", -1)]
+CATALOG_INDEX = [("is_active", 1), *CATALOG_SORT]
+
+# format_size units, each 1024x the previous
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+# Indexes superseded by compound ones (prefix / is_active-led); dropped on connect
+OBSOLETE_INDEXES = ("uploaded_by_1", "created_at_-1", "is_active_1_created_at_-1")
+
+# Connection pool sizing - enough for concurrent /stream_* lookups
+MONGO_POOL_OPTS = {"maxPoolSize": 50, "minPoolSize": 5, "waitQueueTimeoutMS": 5000}
+
+# Acknowledged but not journaled - index inserts and counter bumps skip the fsync wait
+FAST_WRITE_CONCERN = WriteConcern(w=1, j=False)
+
+def format_size(size_bytes: int) -> str:
+    """
+    Format file size in human-readable format.
+    
+    Converts bytes to KB, MB, GB, TB, or PB as appropriate.
+    
+    Args:
+        size_bytes (int): File size in bytes
+        
+    Returns:
+        str: Formatted size string (e.g., "1.5 MB")
+        
+    Example:
+        >>> format_size(1574507)
+        '1.5 MB'
+    """
+    if size_bytes <= 0:
+        return "0 B"
+    
+    # Unit index straight from the bit length (every unit is 2**10 apart)
+    i = min((size_bytes.bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (i * 10)):.1f} {SIZE_UNITS[i]}"
+
+
 class DatabaseManager:
     """
     MongoDB operations manager for file indexing.
@@ -31,6 +88,13 @@ class DatabaseManager:
     - uploaded_by: User's Telegram ID
     - created_at: Timestamp
     - is_active: Soft delete flag
+    
+    A 'stats' collection keeps an O(1) active-file counter
+    ({_id: "catalog", count: N}) maintained on insert/delete.
+    
+    An 'auth_keys' collection ({_id: dc_id, sealed: bytes}) persists the
+    session pool's per-DC MTProto auth keys across restarts, encrypted
+    (only when Config.PERSIST_AUTH_KEYS is set).
     """
     
     def __init__(self):
@@ -38,6 +102,13 @@ class DatabaseManager:
         self.client = None
         self.db = None
         self.collection = None
+        self.stats = None
+        self.auth_keys = None
+        self._fast_collection = None  # collection with FAST_WRITE_CONCERN
+        self._fast_stats = None
+        self._save_queue = None
+        self._writer_task = None
+        self._search_cache = TTLCache(maxsize=512, ttl=120)  # (query, limit) -> results; cleared on insert/delete
         
     async def connect(self):
         """
@@ -45,9 +116,14 @@ class DatabaseManager:
         
         Creates the following indexes for performance:
         - message_id (unique): Fast lookups by Telegram message
-        - uploaded_by: Filter files by user
-        - created_at (descending): Sort by newest first
+        - message_id + is_active + custom_name + file_size: Covers get_file,
+          answered from the index alone with no document fetch
+        - uploaded_by + created_at (descending): Per-user listing, newest first
+          (its uploaded_by prefix also serves plain per-user filters)
+        - is_active + created_at + _id (descending): Catalog walk, newest
+          first, with no in-memory sort and no fetches of deleted files
         - custom_name (text): Full-text search support
+        - custom_name_lower: Prefix search (anchored regex = index range scan)
         
         Raises:
             Exception: If connection fails or indexes cannot be created
@@ -55,28 +131,83 @@ class DatabaseManager:
         try:
             # Extract cluster name without exposing credentials
             cluster_name = Config.MONGO_URL.split("@")[1].split(".")[0] if "@" in Config.MONGO_URL else "unknown"
-            logger.info(f"✅ Connecting to MongoDB cluster: {cluster_name}")
+            logger.info("✅ Connecting to MongoDB cluster: %s", cluster_name)
             
-            self.client = AsyncIOMotorClient(Config.MONGO_URL)
+            # Native asyncio driver - speaks the wire protocol on the event loop,
+            # no thread-pool hop per query like Motor
+            self.client = AsyncMongoClient(Config.MONGO_URL, **MONGO_POOL_OPTS)
             self.db = self.client[Config.MONGO_DB_NAME]
             self.collection = self.db.indexed_files
+            self.stats = self.db.stats
+            self.auth_keys = self.db.auth_keys
+            self._fast_collection = self.collection.with_options(write_concern=FAST_WRITE_CONCERN)
+            self._fast_stats = self.stats.with_options(write_concern=FAST_WRITE_CONCERN)
             
             # Create indexes for better query performance
             logger.debug("Creating database indexes...")
             await self.collection.create_index([("message_id", 1)], unique=True)
-            await self.collection.create_index([("uploaded_by", 1)])
-            await self.collection.create_index([("created_at", -1)])
+            await self.collection.create_index(FILE_LOOKUP_INDEX)
+            await self.collection.create_index([("uploaded_by", 1), ("created_at", -1)])
+            await self.collection.create_index(CATALOG_INDEX)
             await self.collection.create_index([("custom_name", "text")])
+            await self.collection.create_index([("custom_name_lower", 1)])
+
+            # Backfill the prefix-search key on files indexed before it existed
+            await self._backfill_name_lower()
+
+            # Fewer indexes = less write amplification on every insert/soft delete
+            existing = await self.collection.index_information()
+            for name in OBSOLETE_INDEXES:
+                if name in existing:
+                    await self.collection.drop_index(name)
+                    logger.info("Dropped superseded index %s", name)
             
             # Verify schema
             await self._verify_schema()
             
+            # Seed the catalog counter once (existing archives predate it)
+            await self._init_catalog_counter()
+            
+            # Start background bulk writer for queued inserts
+            self._save_queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._bulk_writer())
+            
             logger.info("✅ MongoDB connected successfully")
             
         except Exception as e:
-            logger.error(f"❌ MongoDB connection failed: {e}", exc_info=True)
+            logger.error("❌ MongoDB connection failed: %s", e, exc_info=True)
             raise
 
+    async def _backfill_name_lower(self):
+        """
+        Set custom_name_lower with Python's str.lower() where it is missing or stale.
+        
+        Writes and queries lowercase in Python, so the backfill must too:
+        Mongo's $toLower only folds ASCII. Besides missing keys, non-ASCII
+        names are re-checked to repair rows an earlier $toLower backfill
+        left in mixed case.
+        """
+        cursor = self.collection.find(
+            {"$or": [
+                {"custom_name_lower": {"$exists": False}},
+                {"custom_name": {"$regex": "[^\\x00-\\x7F]"}},
+            ]},
+            {"custom_name": 1, "custom_name_lower": 1},
+        )
+        ops = []
+        fixed = 0
+        async for doc in cursor:
+            lower = (doc.get("custom_name") or "").lower()
+            if doc.get("custom_name_lower") != lower:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"custom_name_lower": lower}}))
+            if len(ops) >= SAVE_BATCH_SIZE:
+                fixed += (await self.collection.bulk_write(ops, ordered=False)).modified_count
+                ops = []
+        if ops:
+            fixed += (await self.collection.bulk_write(ops, ordered=False)).modified_count
+        if fixed:
+            logger.info("Backfilled custom_name_lower on %d files", fixed)
+
     async def _verify_schema(self):
         """
         Verify MongoDB collection schema and indexes.
@@ -96,28 +227,77 @@ class DatabaseManager:
                 return
             
             # Check indexes
-            indexes = await self.collection.list_indexes().to_list(length=None)
-            index_names = [idx['name'] for idx in indexes]
+            index_names = list(await self.collection.index_information())
             
-            required = ['message_id_1', 'uploaded_by_1', 'created_at_-1', 'custom_name_text']
+            required = [
+                'message_id_1', 'message_id_1_is_active_1_custom_name_1_file_size_1',
+                'uploaded_by_1_created_at_-1',
+                'is_active_1_created_at_-1__id_-1', 'custom_name_text', 'custom_name_lower_1'
+            ]
             missing = [idx for idx in required if idx not in index_names]
             
             if missing:
-                logger.warning(f"⚠️ Missing indexes: {missing}")
+                logger.warning("⚠️ Missing indexes: %s", missing)
             else:
                 logger.info("✅ MongoDB schema verified - all indexes present")
                 
         except Exception as e:
-            logger.error(f"Schema verification failed: {e}", exc_info=True)
+            logger.error("Schema verification failed: %s", e, exc_info=True)
+
+    async def _init_catalog_counter(self):
+        """
+        Create the catalog counter document if it doesn't exist yet.
+        
+        Counts active files once; afterwards the counter is maintained
+        incrementally by the insert and delete paths.
+        """
+        try:
+            if await self.stats.find_one({"_id": "catalog"}) is None:
+                count = await self.collection.count_documents({"is_active": True})
+                await self.stats.update_one(
+                    {"_id": "catalog"},
+                    {"$setOnInsert": {"count": count}},
+                    upsert=True
+                )
+                logger.info("Catalog counter initialized: %s active files", count)
+        except Exception as e:
+            logger.error("Catalog counter init failed: %s", e, exc_info=True)
+
+    async def _bump_catalog_count(self, delta: int):
+        """Adjust the cached active-file counter by delta."""
+        if not delta:
+            return
+        try:
+            await self._fast_stats.update_one({"_id": "catalog"}, {"$inc": {"count": delta}}, upsert=True)
+        except Exception as e:
+            logger.error("Error updating catalog counter: %s", e, exc_info=True)
 
     async def disconnect(self):
         """
         Close MongoDB connection gracefully.
         
+        Flushes any queued inserts before closing.
         Should be called during application shutdown.
         """
+        if self._writer_task:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+
+            # Drain whatever the writer didn't get to
+            pending = []
+            while not self._save_queue.empty():
+                pending.append(self._save_queue.get_nowait())
+            if pending:
+                await self._flush_batch(pending)
+            # Later saves go straight to insert_one instead of a dead queue
+            self._save_queue = None
+
         if self.client:
-            self.client.close()
+            await self.client.close()
             logger.info("MongoDB disconnected")
 
     async def save_file(self, file_data: Dict[str, Any]) -> Optional[ObjectId]:
@@ -127,6 +307,11 @@ class DatabaseManager:
         This function stores information about uploaded files in MongoDB,
         including file IDs, custom names, sizes, and source information.
         
+        While the background writer runs, the document joins its next
+        unordered bulk_write and this call resolves once that batch is
+        flushed (at most SAVE_BATCH_WINDOW later), so concurrent saves share
+        one round-trip. Otherwise it falls back to a direct insert_one.
+        
         Args:
             file_data (Dict): File metadata containing:
                 - message_id (int): Telegram message ID in LOG_CHANNEL
@@ -148,62 +333,179 @@ class DatabaseManager:
             ... }
             >>> result = await db.save_file(file_data)
         """
+        # Add timestamps for audit trail
+        file_data["created_at"] = datetime.utcnow()
+        file_data["is_active"] = True  # For soft delete support
+        file_data["custom_name_lower"] = (file_data.get("custom_name") or "").lower()
+
+        if self._save_queue is not None:
+            inserted = asyncio.get_running_loop().create_future()
+            await self._save_queue.put((file_data, inserted))
+            logger.debug("Saving file via bulk writer: %s", file_data.get('custom_name'))
+            return await inserted
+
         try:
-            # Add timestamps for audit trail
-            file_data["created_at"] = datetime.utcnow()
-            file_data["is_active"] = True  # For soft delete support
-            
-            logger.debug(f"Saving file to database: {file_data.get('custom_name')}")
+            logger.debug("Saving file to database: %s", file_data.get('custom_name'))
             
             # Insert into MongoDB collection
-            result = await self.collection.insert_one(file_data)
+            result = await self._fast_collection.insert_one(file_data)
+            await self._bump_catalog_count(1)
+            self._search_cache.clear()  # Cached /search results may now miss it
             
             # Log successful save with key details
+            # %-style: the message is only rendered if INFO is enabled
             logger.info(
-                f"File indexed: message_id={file_data.get('message_id')}, "
-                f"name={file_data.get('custom_name')}, "
-                f"size={self._format_size(file_data.get('file_size', 0))}, "
-                f"user={file_data.get('uploaded_by')}"
+                "File indexed: message_id=%s, name=%s, size=%s, user=%s",
+                file_data.get('message_id'),
+                file_data.get('custom_name'),
+                format_size(file_data.get('file_size', 0)),
+                file_data.get('uploaded_by'),
             )
             return result.inserted_id
             
         except Exception as e:
-            logger.error(f"Error saving file: {e}", exc_info=True)
+            logger.error("Error saving file: %s", e, exc_info=True)
             return None
 
+    async def enqueue_file(self, file_data: Dict[str, Any]):
+        """
+        Queue file metadata for a batched, unordered insert.
+        
+        Returns immediately; the background writer flushes queued documents
+        with a single bulk_write per batch. Use this on upload completion paths
+        where the caller doesn't need the inserted ObjectId.
+        
+        Args:
+            file_data (Dict): File metadata (same shape as save_file)
+            
+        Example:
+            >>> await db.enqueue_file({"message_id": 159, "custom_name": "My_Video"})
+        """
+        if self._save_queue is None:
+            # Writer not running (DB not connected yet) - fall back to direct insert
+            await self.save_file(file_data)
+            return
+
+        file_data["created_at"] = datetime.utcnow()
+        file_data["is_active"] = True
+        file_data["custom_name_lower"] = (file_data.get("custom_name") or "").lower()
+        await self._save_queue.put((file_data, None))
+        logger.debug("Queued file for indexing: %s", file_data.get('custom_name'))
+
+    async def _bulk_writer(self):
+        """
+        Background task draining the save queue into unordered bulk writes.
+        
+        Waits for the first document, then collects up to SAVE_BATCH_SIZE
+        documents or until SAVE_BATCH_WINDOW seconds pass, whichever is first.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._save_queue.get()]
+            deadline = loop.time() + SAVE_BATCH_WINDOW
+
+            try:
+                while len(batch) < SAVE_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._save_queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Shutting down mid-collection - don't drop (or strand the
+                # save_file waiters of) documents already taken off the queue
+                await self._flush_batch(batch)
+                raise
+
+            await self._flush_batch(batch)
+
+    async def _flush_batch(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]):
+        """
+        Insert a batch of documents with a single unordered bulk_write.
+        
+        Unordered writes let MongoDB continue past individual failures
+        (e.g. duplicate message_id) instead of aborting the whole batch.
+        Waiting save_file() calls get their inserted _id, or None if their
+        document failed.
+        
+        Args:
+            batch (List[Tuple[Dict, Future]]): (document, save_file future or
+                None for enqueue_file) pairs to insert
+        """
+        failed = None  # Indexes of documents that weren't inserted; None = whole batch
+        try:
+            result = await self._fast_collection.bulk_write(
+                [InsertOne(doc) for doc, _ in batch], ordered=False
+            )
+            failed = ()
+            logger.info("Bulk indexed %d/%d files", result.inserted_count, len(batch))
+            await self._bump_catalog_count(result.inserted_count)
+            if result.inserted_count:
+                self._search_cache.clear()  # Cached /search results may now miss them
+        except BulkWriteError as e:
+            inserted = e.details.get('nInserted', 0)
+            failed = {err["index"] for err in e.details.get('writeErrors', [])}
+            logger.error(
+                "Bulk insert partially failed: %d/%d inserted, errors=%d",
+                inserted, len(batch), len(failed),
+            )
+            await self._bump_catalog_count(inserted)
+            if inserted:
+                self._search_cache.clear()
+        except Exception as e:
+            logger.error("Error in bulk insert: %s", e, exc_info=True)
+        finally:
+            # InsertOne sets _id on the document in place
+            for i, (doc, inserted) in enumerate(batch):
+                if inserted is not None and not inserted.done():
+                    inserted.set_result(None if failed is None or i in failed else doc.get("_id"))
+
     async def get_file(self, message_id: int) -> Optional[Dict[str, Any]]:
         """
         Get file metadata by message_id.
         
+        A covered query: the filter and FILE_LOOKUP_PROJECTION fields all live
+        in FILE_LOOKUP_INDEX, so MongoDB answers from the index without
+        fetching the document.
+        
         Args:
             message_id (int): Telegram message ID in LOG_CHANNEL
             
         Returns:
-            Dict: File metadata if found and active, None otherwise
+            Dict: message_id, custom_name and file_size if found and active,
+                None otherwise
             
         Example:
             >>> file = await db.get_file(159)
             >>> print(file['custom_name'])
         """
         try:
-            logger.debug(f"Fetching file with message_id={message_id}")
-            return await self.collection.find_one({"message_id": message_id, "is_active": True})
+            logger.debug("Fetching file with message_id=%s", message_id)
+            return await self.collection.find_one(
+                {"message_id": message_id, "is_active": True},
+                FILE_LOOKUP_PROJECTION,
+                hint=FILE_LOOKUP_INDEX,
+            )
         except Exception as e:
-            logger.error(f"Error getting file {message_id}: {e}", exc_info=True)
+            logger.error("Error getting file %s: %s", message_id, e, exc_info=True)
             return None
 
     async def get_catalog(self, limit: int = 50, skip: int = 0) -> List[Dict[str, Any]]:
         """
         Get paginated catalog of indexed files.
         
-        Returns files sorted by creation date (newest first).
+        Returns files sorted by creation date (newest first). Paginated
+        views that also need the total should call get_catalog_with_count,
+        which overlaps both reads instead of paying two round-trips.
         
         Args:
             limit (int): Maximum number of files to return (default: 50)
             skip (int): Number of files to skip for pagination (default: 0)
             
         Returns:
-            List[Dict]: List of file metadata dictionaries
+            List[Dict]: Files projected to CATALOG_PROJECTION (keyed by message_id, no _id)
             
         Example:
             >>> files = await db.get_catalog(limit=20, skip=0)
@@ -211,25 +513,28 @@ class DatabaseManager:
             ...     print(file['custom_name'])
         """
         try:
-            logger.debug(f"Fetching catalog: limit={limit}, skip={skip}")
-            cursor = self.collection.find({"is_active": True}).sort("created_at", -1).skip(skip).limit(limit)
+            logger.debug("Fetching catalog: limit=%s, skip=%s", limit, skip)
+            # batch_size(limit): the whole page arrives in the first reply, no getMore
+            cursor = (
+                self.collection.find({"is_active": True}, CATALOG_PROJECTION)
+                .sort(CATALOG_SORT).skip(skip).limit(limit).batch_size(limit)
+            )
             files = await cursor.to_list(length=limit)
             
-            # Convert ObjectId to string for JSON serialization
-            for file in files:
-                file["_id"] = str(file["_id"])
-            
-            logger.info(f"Catalog fetched: {len(files)} files returned")
+            logger.info("Catalog fetched: %d files returned", len(files))
             return files
             
         except Exception as e:
-            logger.error(f"Error getting catalog: {e}", exc_info=True)
+            logger.error("Error getting catalog: %s", e, exc_info=True)
             return []
 
     async def get_catalog_count(self) -> int:
         """
         Get total count of active indexed files.
         
+        Reads the O(1) counter document instead of counting the collection;
+        falls back to count_documents if the counter is missing.
+        
         Returns:
             int: Total number of active files in database
             
@@ -238,13 +543,103 @@ class DatabaseManager:
             >>> print(f"Total files: {count}")
         """
         try:
-            count = await self.collection.count_documents({"is_active": True})
-            logger.debug(f"Catalog count: {count} active files")
+            stats = await self.stats.find_one({"_id": "catalog"})
+            if stats is not None:
+                count = stats["count"]
+            else:
+                count = await self.collection.count_documents({"is_active": True})
+            logger.debug("Catalog count: %s active files", count)
             return count
         except Exception as e:
-            logger.error(f"Error getting catalog count: {e}", exc_info=True)
+            logger.error("Error getting catalog count: %s", e, exc_info=True)
             return 0
 
+    async def get_catalog_with_count(self, limit: int = 50, skip: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Get a catalog page and the active-file total in one round of I/O.
+        
+        Rows carry created_at and _id, so a caller can continue with
+        get_catalog_after from catalog_cursor(files[-1]).
+        
+        The page query (projected to the fields list replies render) and the
+        counter read are issued concurrently, so the command waits for one
+        round-trip instead of two. The total still comes from the O(1)
+        counter document rather than a $facet/$count over the collection.
+        
+        Args:
+            limit (int): Maximum number of files to return (default: 50)
+            skip (int): Number of files to skip for pagination (default: 0)
+            
+        Returns:
+            Tuple[List[Dict], int]: (files, total active file count)
+            
+        Example:
+            >>> files, total = await db.get_catalog_with_count(limit=50, skip=50)
+        """
+        async def _page() -> List[Dict[str, Any]]:
+            cursor = (
+                self.collection.find({"is_active": True}, CATALOG_PAGE_PROJECTION)
+                .sort(CATALOG_SORT).skip(skip).limit(limit).batch_size(limit)
+            )
+            return await cursor.to_list(length=limit)
+
+        try:
+            files, total = await asyncio.gather(_page(), self.get_catalog_count())
+            logger.info("Catalog fetched: %d/%s files returned", len(files), total)
+            return files, total
+        except Exception as e:
+            logger.error("Error getting catalog: %s", e, exc_info=True)
+            return [], 0
+
+    @staticmethod
+    def catalog_cursor(file: Dict[str, Any]) -> Tuple[datetime, ObjectId]:
+        """Keyset cursor (created_at, _id) of a paged catalog row"""
+        return file["created_at"], file["_id"]
+
+    async def get_catalog_after(
+        self, cursor: Optional[Tuple[datetime, ObjectId]], limit: int = 50
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[datetime, ObjectId]]]:
+        """
+        Get the catalog page that follows a (created_at, _id) cursor (keyset pagination).
+        
+        Unlike skip/limit, which walks and discards every earlier index entry,
+        this is an O(limit) range scan on the (is_active, created_at, _id)
+        index at any depth. The _id tiebreak keeps files indexed in the same
+        millisecond (bulk-written batches) from being skipped at a page edge.
+        
+        Args:
+            cursor (tuple): (created_at, _id) of the last file already shown,
+                or None for the first page
+            limit (int): Maximum number of files to return (default: 50)
+            
+        Returns:
+            Tuple[List[Dict], Optional[tuple]]: (files, cursor for the next
+                page, or None when this page is the last one)
+            
+        Example:
+            >>> files, cursor = await db.get_catalog_after(None, limit=50)
+            >>> more, cursor = await db.get_catalog_after(cursor, limit=50)
+        """
+        query = {"is_active": True}
+        if cursor is not None:
+            ts, oid = cursor
+            query["$or"] = [
+                {"created_at": {"$lt": ts}},
+                {"created_at": ts, "_id": {"$lt": oid}},
+            ]
+        try:
+            find = (
+                self.collection.find(query, CATALOG_PAGE_PROJECTION)
+                .sort(CATALOG_SORT).limit(limit).batch_size(limit)
+            )
+            files = await find.to_list(length=limit)
+            next_cursor = self.catalog_cursor(files[-1]) if len(files) == limit else None
+            logger.debug("Catalog page after %s: %d files", cursor, len(files))
+            return files, next_cursor
+        except Exception as e:
+            logger.error("Error getting catalog after %s: %s", cursor, e, exc_info=True)
+            return [], None
+
     async def delete_file(self, message_id: int) -> bool:
         """
         Soft delete file by setting is_active = False.
@@ -262,28 +657,34 @@ class DatabaseManager:
             >>> print("Deleted" if success else "Not found")
         """
         try:
-            logger.debug(f"Deleting file with message_id={message_id}")
+            logger.debug("Deleting file with message_id=%s", message_id)
             result = await self.collection.update_one(
                 {"message_id": message_id},
                 {"$set": {"is_active": False}}
             )
             
             if result.modified_count > 0:
-                logger.info(f"File deleted: message_id={message_id}")
+                await self._bump_catalog_count(-1)
+                self._search_cache.clear()  # Don't keep serving its dead /stream_ link
+                logger.info("File deleted: message_id=%s", message_id)
                 return True
             
-            logger.warning(f"File not found for deletion: message_id={message_id}")
+            logger.warning("File not found for deletion: message_id=%s", message_id)
             return False
             
         except Exception as e:
-            logger.error(f"Error deleting file {message_id}: {e}", exc_info=True)
+            logger.error("Error deleting file %s: %s", message_id, e, exc_info=True)
             return False
 
     async def search_files(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
         """
-        Search files by custom name using full-text search.
+        Search files by custom name: name prefix or whole-word match.
         
-        Uses MongoDB text index for fast searching.
+        A case-insensitive prefix ("aven" -> "Avengers") is an anchored regex
+        on the indexed custom_name_lower field; whole words anywhere in the
+        name still come from the text index. Both run as one indexed $or.
+        Projects only the fields the reply needs and caches results per
+        query for 2 minutes.
         
         Args:
             query (str): Search query string
@@ -298,49 +699,30 @@ class DatabaseManager:
             ...     print(file['custom_name'])
         """
         try:
-            logger.debug(f"Searching files with query='{query}', limit={limit}")
+            cache_key = (query.lower(), limit)
+            cached = self._search_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Search cache hit for query='%s'", query)
+                return cached
+
+            logger.debug("Searching files with query='%s', limit=%s", query, limit)
             cursor = self.collection.find({
                 "is_active": True,
-                "$text": {"$search": query}
-            }).sort("created_at", -1).limit(limit)
+                "$or": [
+                    {"custom_name_lower": {"$regex": f"^{re.escape(query.lower())}"}},
+                    {"$text": {"$search": query}},
+                ],
+            }, SEARCH_PROJECTION).sort("created_at", -1).limit(limit).batch_size(limit)
             
             files = await cursor.to_list(length=limit)
+            self._search_cache[cache_key] = files
             
-            # Convert ObjectId to string for JSON serialization
-            for file in files:
-                file["_id"] = str(file["_id"])
-            
-            logger.info(f"Search completed: {len(files)} files found for query '{query}'")
+            logger.info("Search completed: %d files found for query '%s'", len(files), query)
             return files
             
         except Exception as e:
-            logger.error(f"Error searching files with query '{query}': {e}", exc_info=True)
+            logger.error("Error searching files with query '%s': %s", query, e, exc_info=True)
             return []
 
-    def _format_size(self, size_bytes: int) -> str:
-        """
-        Format file size in human-readable format.
-        
-        Converts bytes to KB, MB, GB, TB, or PB as appropriate.
-        
-        Args:
-            size_bytes (int): File size in bytes
-            
-        Returns:
-            str: Formatted size string (e.g., "1.5 MB")
-            
-        Example:
-            >>> db._format_size(1574507)
-            '1.5 MB'
-        """
-        if size_bytes == 0:
-            return "0 B"
-        
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if size_bytes < 1024.0:
-                return f"{size_bytes:.1f} {unit}"
-            size_bytes /= 1024.0
-        return f"{size_bytes:.1f} PB"
-
 # Global database instance
 db = DatabaseManager()
\ No newline at end of file
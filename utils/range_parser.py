@@ -7,8 +7,16 @@ Handles byte-range requests (HTTP 206 Partial Content) to support:
 - Efficient bandwidth usage
 """
 
+import re
+from typing import Union
 
-def parse_range(range_header: str, file_size: int):
+# Single-range "bytes=first-[last]" - one match instead of split()/int() on pieces
+_RANGE_RE = re.compile(r"bytes=([0-9]+)-([0-9]*)")
+# Same pattern for raw ASGI header values (int() accepts the bytes groups directly)
+_RANGE_RE_BYTES = re.compile(rb"bytes=([0-9]+)-([0-9]*)")
+
+
+def parse_range(range_header: Union[str, bytes], file_size: int):
     """
     Parse HTTP Range header and return byte offsets.
     
@@ -18,11 +26,14 @@ def parse_range(range_header: str, file_size: int):
     - "bytes=-1024" - Request last N bytes (not supported)
     
     Args:
-        range_header (str): HTTP Range header value (e.g., "bytes=0-1023")
+        range_header (str | bytes): HTTP Range header value (e.g., "bytes=0-1023"),
+            decoded or raw from the ASGI scope
         file_size (int): Total file size in bytes
         
     Returns:
-        tuple: (start, end) byte offsets if valid, None if invalid
+        tuple: (start, end) byte offsets if valid, None if invalid.
+            start may be >= file_size - the range is well-formed but
+            unsatisfiable, and the caller must answer 416.
         
     Example:
         >>> parse_range("bytes=0-1023", 10000)
@@ -31,33 +42,33 @@ def parse_range(range_header: str, file_size: int):
         >>> parse_range("bytes=5000-", 10000)
         (5000, 9999)
         
+        >>> parse_range("bytes=20000-", 10000)  # Unsatisfiable -> 416
+        (20000, 9999)
+        
         >>> parse_range("invalid", 10000)
         None
     """
-    try:
-        # Validate header format
-        if not range_header or "=" not in range_header:
-            return None
-        
-        # Split into unit and range values
-        unit, ranges = range_header.split("=")
-        if unit != "bytes":
+    if not range_header:
+        return None
+    pattern = _RANGE_RE_BYTES if isinstance(range_header, bytes) else _RANGE_RE
+    m = pattern.fullmatch(range_header)
+    if m is None:
+        # Missing, non-bytes, suffix ("-N") or non-numeric - ignored
+        return None
+
+    start = int(m.group(1))
+    end_str = m.group(2)
+    if end_str:
+        end = int(end_str)
+        # last < first is malformed - ignored like a missing header
+        if end < start:
             return None
-        
-        # Parse start and end positions
-        start_str, end_str = ranges.split("-")
-        
-        start = int(start_str)
+    else:
         # If end is missing, serve from start to file end
-        end = int(end_str) if end_str else file_size - 1
-        
-        # Validate range boundaries
-        if start >= file_size:
-            return None
-        if end >= file_size:
-            end = file_size - 1
-            
-        return start, end
-    except ValueError:
-        # Invalid format or non-numeric values
-        return None
\ No newline at end of file
+        end = file_size - 1
+
+    # Validate range boundaries
+    if end >= file_size:
+        end = file_size - 1
+
+    return start, end